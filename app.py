@@ -6,18 +6,105 @@ This module provides the backend API for the POS system.
 It handles database operations and WebSocket events.
 """
 
+import base64
+import bisect
+import csv
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
 import os
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
-from marshmallow import Schema, fields, validate, ValidationError
+import random
+import re
+import shutil
+import threading
+import time
+import uuid
+import zlib
+import click
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import (Flask, Response, g, has_request_context, render_template, request, jsonify,
+                   send_from_directory, url_for)
+from flask_socketio import SocketIO, join_room, leave_room
+from marshmallow import EXCLUDE, Schema, fields, validate, validates_schema, ValidationError
 import mariadb
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables
 DB_HOST = os.environ.get('DB_HOST', 'localhost')
 DB_USER = os.environ.get('DB_USER', 'pos_user')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', '1234')
 DB_NAME = os.environ.get('DB_NAME', 'pos')
+DB_PORT = int(os.environ.get('DB_PORT', '3306'))
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+DB_POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', '5'))
+# Connections opened by the startup warm-up
+DB_POOL_WARM = int(os.environ.get('DB_POOL_WARM', str(DB_POOL_SIZE)))
+# Seconds between startup warm-up attempts while the database is unavailable
+WARMUP_RETRY_INTERVAL = float(os.environ.get('WARMUP_RETRY_INTERVAL', '5'))
+
+# Serving mode: 'threading' for the development server, 'gevent' or 'eventlet'
+# under gunicorn (see gunicorn.conf.py). Under gevent/eventlet blocking
+# database calls run on a pool of DB_THREADS native threads.
+ASYNC_MODE = os.environ.get('ASYNC_MODE', 'threading')
+DB_THREADS = int(os.environ.get('DB_THREADS', str(DB_POOL_SIZE)))
+
+# Reporting settings
+BUSINESS_DAY_CUTOFF_HOUR = int(os.environ.get('BUSINESS_DAY_CUTOFF_HOUR', '0'))
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', '2'))
+
+# Archival settings
+ARCHIVE_AFTER_DAYS = float(os.environ.get('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+ARCHIVE_BATCH_PAUSE = float(os.environ.get('ARCHIVE_BATCH_PAUSE', '0.2'))
+ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', '600'))
+
+# Idempotent order creation: hours an idempotency key is remembered, and
+# the largest offline backlog accepted by one replay request
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+MAX_REPLAY_ENTRIES = int(os.environ.get('MAX_REPLAY_ENTRIES', '200'))
+
+# Change feed: seconds the feed stays behind NOW() so rows written by
+# transactions that had not committed yet are not skipped
+CHANGE_FEED_LAG = float(os.environ.get('CHANGE_FEED_LAG', '2'))
+
+# Prep stations: station name -> menu categories it prepares, e.g.
+# {"bar": ["Classic Cocktails", "Beer & Wine"]}. Categories not listed
+# anywhere belong to DEFAULT_STATION.
+STATIONS = json.loads(os.environ.get('STATIONS', '{}'))
+DEFAULT_STATION = os.environ.get('DEFAULT_STATION', 'kitchen')
+
+# Query tracing: per-request statement log with slow query and N+1
+# detection, on by default in development
+QUERY_TRACE = os.environ.get(
+    'QUERY_TRACE', '1' if os.environ.get('FLASK_ENV') == 'development' else '0') == '1'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '5'))
+
+# Response compression: bodies at least this large are gzip- or
+# brotli-encoded (brotli when the optional package is installed)
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+# Socket event coalescing window in milliseconds (0 sends every event at once)
+EVENT_BATCH_WINDOW_MS = float(os.environ.get('EVENT_BATCH_WINDOW_MS', '50'))
 
 # Constants
 ORDER_STATUS = {
@@ -30,6 +117,7 @@ ORDER_STATUS = {
 # Database configuration
 db_config = {
     'host': DB_HOST,
+    'port': DB_PORT,
     'user': DB_USER,
     'password': DB_PASSWORD,
     'database': DB_NAME
@@ -37,25 +125,1254 @@ db_config = {
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False
-socketio = SocketIO(app)
+socketio = SocketIO(app, async_mode=ASYNC_MODE)
 
-# Utility functions
-def get_db_connection():
-    """Get a database connection."""
+# Metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECIPIENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+class Metric:
+    """Base for labelled metrics kept in process memory.
+
+    Series are keyed by the tuple of label values passed positionally to
+    the update methods, in ``labelnames`` order.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def collect(self):
+        with self._lock:
+            series = dict(self._series)
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+            for labels, value in sorted(series.items())
+        ]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+class Gauge(Metric):
+    """Gauge set directly or read from ``callback()`` at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+        if not self.labelnames:
+            self._series[()] = 0
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def collect(self):
+        if self._callback is not None:
+            with self._lock:
+                self._series = {(): self._callback()}
+        return super().collect()
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One slot per bucket plus +Inf, then the running sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        lines = self.header()
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket'
+                             f'{_format_labels(self.labelnames, labels, [("le", bound)])} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {values[-1]}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    """Metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+REQUEST_LATENCY = metrics.register(Histogram(
+    'pos_http_request_duration_seconds', 'HTTP request latency by endpoint.', ('endpoint', 'method')))
+REQUESTS_TOTAL = metrics.register(Counter(
+    'pos_http_requests_total', 'HTTP responses by endpoint and status.', ('endpoint', 'method', 'status')))
+REQUEST_DB_TIME = metrics.register(Histogram(
+    'pos_http_request_db_seconds', 'Time spent in database calls per request.', ('endpoint',)))
+DB_STATEMENTS_TOTAL = metrics.register(Counter(
+    'pos_db_statements_total', 'SQL statements executed by endpoint.', ('endpoint',)))
+DB_ACQUIRE_SECONDS = metrics.register(Histogram(
+    'pos_db_pool_acquire_seconds', 'Time spent waiting for a pooled connection.'))
+SOCKET_CLIENTS = metrics.register(Gauge(
+    'pos_socket_clients', 'Connected Socket.IO clients.'))
+SOCKET_EVENTS_TOTAL = metrics.register(Counter(
+    'pos_socket_events_total', 'Events published by name.', ('event',)))
+SOCKET_MESSAGES_TOTAL = metrics.register(Counter(
+    'pos_socket_messages_total', 'Room messages delivered after coalescing, by event.', ('event',)))
+SOCKET_RECIPIENTS = metrics.register(Histogram(
+    'pos_socket_recipients', 'Clients in the room per delivered message.', ('event',),
+    buckets=RECIPIENT_BUCKETS))
+
+def record_db_call(elapsed, statement=False):
+    """Add a database call to the current request's totals, if any."""
+    if has_request_context():
+        g.db_time = g.get('db_time', 0.0) + elapsed
+        if statement:
+            g.db_statements = g.get('db_statements', 0) + 1
+
+# Query tracing
+_SQL_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_SQL_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SQL_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SQL_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SQL_WHENS = re.compile(r'WHEN \? THEN \?(?: WHEN \? THEN \?)+', re.IGNORECASE)
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+def normalize_sql(sql):
+    """Reduce ``sql`` to its shape: literals become ``?`` and lists ``(...)``.
+
+    Statements that differ only in parameter values or in the length of an
+    ``IN`` list, multi-row ``VALUES`` clause or ``CASE`` map normalize to
+    the same text.
+    """
+    sql = ' '.join(sql.split()).replace('%s', '?')
+    sql = _SQL_STRING.sub('?', sql)
+    sql = _SQL_NUMBER.sub('?', sql)
+    sql = _SQL_LIST.sub('(...)', sql)
+    sql = _SQL_WHENS.sub('WHEN ? THEN ? ...', sql)
+    return _SQL_ROWS.sub('(...)', sql)
+
+def trace_statement(sql, params, elapsed, rows):
+    """Record one statement in the current request's trace."""
+    if not QUERY_TRACE or not has_request_context():
+        return
+    entry = {
+        'sql': normalize_sql(sql),
+        'duration_ms': round(elapsed * 1000, 3),
+        'rows': rows
+    }
+    if entry['duration_ms'] >= SLOW_QUERY_MS:
+        entry['slow'] = True
+        # Kept only for slow statements, to EXPLAIN them after the request
+        entry['raw'] = (sql, params)
+    g.setdefault('query_trace', []).append(entry)
+
+def explain_statement(sql, params):
+    """Return the EXPLAIN rows for ``sql`` on a separate pooled connection."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
     try:
-        return mariadb.connect(**db_config)
-    except mariadb.Error as e:
-        app.logger.error(f"Error connecting to MariaDB: {e}")
-        raise
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f'EXPLAIN {sql}', params or ())
+            plan = cursor.fetchall()
+            cursor.close()
+        return plan
+    except Exception as e:
+        return [{'error': str(e)}]
+
+def summarize_query_trace(trace, endpoint):
+    """Build the log records for one request's statements.
+
+    Returns ``(findings, summary)``: one record per slow statement and per
+    statement shape repeated at least ``N_PLUS_ONE_THRESHOLD`` times, and
+    an overall summary of the request.
+    """
+    findings = []
+    shapes = {}
+    for entry in trace:
+        shape = shapes.setdefault(entry['sql'], {'count': 0, 'duration_ms': 0.0})
+        shape['count'] += 1
+        shape['duration_ms'] += entry['duration_ms']
+        if entry.get('slow'):
+            sql, params = entry.pop('raw')
+            findings.append({
+                'event': 'slow_query',
+                'endpoint': endpoint,
+                'sql': entry['sql'],
+                'duration_ms': entry['duration_ms'],
+                'rows': entry['rows'],
+                'explain': explain_statement(sql, params)
+            })
+    for sql, shape in shapes.items():
+        if shape['count'] >= N_PLUS_ONE_THRESHOLD:
+            findings.append({
+                'event': 'n_plus_one',
+                'endpoint': endpoint,
+                'sql': sql,
+                'count': shape['count'],
+                'duration_ms': round(shape['duration_ms'], 3)
+            })
+    summary = {
+        'event': 'request_queries',
+        'endpoint': endpoint,
+        'statements': len(trace),
+        'distinct_statements': len(shapes),
+        'db_ms': round(sum(entry['duration_ms'] for entry in trace), 3),
+        'rows': sum(max(entry['rows'], 0) for entry in trace),
+        'slow': sum(1 for f in findings if f['event'] == 'slow_query'),
+        'n_plus_one': sum(1 for f in findings if f['event'] == 'n_plus_one'),
+        'trace': trace
+    }
+    return findings, summary
+
+# Blocking call offloading
+class BlockingExecutor:
+    """Run blocking calls on a bounded native thread pool.
 
-def close_db_connection(conn):
-    """Close the database connection."""
-    if conn:
+    The mariadb connector is a C extension that gevent and eventlet cannot
+    patch, so a query run on the event loop stalls every socket served by
+    the worker. Under those async modes calls go to a pool of ``size``
+    threads and only the calling greenlet waits; in threading mode they
+    run inline.
+    """
+
+    def __init__(self, async_mode, size):
+        self.async_mode = async_mode
+        self.size = size
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._pool = None
+        if async_mode == 'gevent':
+            from gevent.threadpool import ThreadPool
+            self._pool = ThreadPool(size)
+        elif async_mode == 'eventlet':
+            from eventlet import tpool
+            tpool.set_num_threads(size)
+            self._pool = tpool
+
+    @property
+    def offloading(self):
+        return self._pool is not None
+
+    def run(self, fn, *args, **kwargs):
+        """Call ``fn(*args, **kwargs)`` off the event loop and return its result."""
+        if self._pool is None:
+            return fn(*args, **kwargs)
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.async_mode == 'gevent':
+                return self._pool.apply(fn, args, kwargs)
+            return self._pool.execute(fn, *args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'async_mode': self.async_mode,
+            'offloading': self.offloading,
+            'threads': self.size if self.offloading else 0,
+            'calls': self.calls,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight
+        }
+
+class PooledCursor:
+    """Cursor proxy that runs calls through ``executor`` and times them."""
+
+    def __init__(self, cursor, executor):
+        self._cursor = cursor
+        self._run = executor.run
+
+    def _call(self, fn, *args, statement=False, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._run(fn, *args, **kwargs)
+        finally:
+            record_db_call(time.perf_counter() - started, statement)
+
+    def _statement(self, fn, sql, params=None, **kwargs):
+        started = time.perf_counter()
+        args = (sql,) if params is None else (sql, params)
+        try:
+            return self._call(fn, *args, statement=True, **kwargs)
+        finally:
+            trace_statement(sql, params, time.perf_counter() - started, self._cursor.rowcount)
+
+    def execute(self, sql, params=None, **kwargs):
+        return self._statement(self._cursor.execute, sql, params, **kwargs)
+
+    def executemany(self, sql, params=None, **kwargs):
+        return self._statement(self._cursor.executemany, sql, params, **kwargs)
+
+    def fetchone(self):
+        return self._call(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._call(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._call(self._cursor.fetchall)
+
+    def close(self):
+        return self._run(self._cursor.close)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class PooledConnection:
+    """Connection proxy whose blocking calls run through ``executor``.
+
+    Commits and rollbacks count towards the request's database time;
+    cursors are wrapped in ``PooledCursor``.
+    """
+
+    def __init__(self, conn, executor):
+        self._conn = conn
+        self._executor = executor
+        self._run = executor.run
+
+    def _call(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._run(fn, *args, **kwargs)
+        finally:
+            record_db_call(time.perf_counter() - started)
+
+    def cursor(self, *args, **kwargs):
+        return PooledCursor(self._run(self._conn.cursor, *args, **kwargs), self._executor)
+
+    def commit(self):
+        return self._call(self._conn.commit)
+
+    def rollback(self):
+        return self._call(self._conn.rollback)
+
+    def ping(self):
+        return self._run(self._conn.ping)
+
+    def close(self):
+        return self._run(self._conn.close)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+db_executor = BlockingExecutor(ASYNC_MODE, DB_THREADS)
+
+# Connection pool
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the timeout."""
+
+
+class ConnectionPool:
+    """A bounded pool of reusable MariaDB connections.
+
+    At most ``size`` connections are open at any time. Idle connections are
+    reused LIFO so the warmest ones stay in service, and a connection that has
+    been idle longer than ``ping_interval`` seconds is pinged before it is
+    handed out; a dead one is replaced transparently. Connections are
+    wrapped in ``PooledConnection`` so their blocking calls go through
+    ``executor`` and are timed per request.
+    """
+
+    def __init__(self, config, size=10, timeout=5.0, ping_interval=5.0, executor=None):
+        self._config = config
+        self._executor = executor
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._opened = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        try:
+            if self._executor is not None:
+                conn = PooledConnection(
+                    self._executor.run(mariadb.connect, **self._config), self._executor)
+            else:
+                conn = mariadb.connect(**self._config)
+        except mariadb.Error as e:
+            app.logger.error(f"Error connecting to MariaDB: {e}")
+            raise
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _close(self, conn):
         try:
             conn.close()
         except mariadb.Error as e:
             app.logger.error(f"Error closing connection: {e}")
 
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        conn = None
+        last_used = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f'No database connection available after {timeout}s')
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+            self._checkouts += 1
+            waited = time.monotonic() - started
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        DB_ACQUIRE_SECONDS.observe(waited)
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - last_used >= self.ping_interval:
+                try:
+                    conn.ping()
+                except mariadb.Error:
+                    self._close(conn)
+                    with self._cond:
+                        self._discarded += 1
+                    conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def warm(self, count=None):
+        """Open connections until ``count`` (default: ``size``) exist.
+
+        The connections are checked out together, so idle ones are reused
+        and only the shortfall is opened, then all go back to the pool.
+        Returns the number of open connections.
+        """
+        count = min(self.size if count is None else count, self.size)
+        conns = []
+        try:
+            while len(conns) < count:
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+        with self._cond:
+            return self._opened
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if not discard:
+            try:
+                conn.rollback()
+            except mariadb.Error:
+                discard = True
+        if discard:
+            self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._opened -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._opened,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'wait_time_total': round(self._wait_total, 6),
+                'wait_time_max': round(self._wait_max, 6),
+                'wait_time_avg': round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0
+            }
+
+
+db_pool = ConnectionPool(
+    db_config,
+    size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    ping_interval=DB_POOL_PING_INTERVAL,
+    executor=db_executor
+)
+metrics.register(Gauge('pos_db_pool_in_use', 'Pooled connections checked out.',
+                       callback=lambda: db_pool.stats()['in_use']))
+metrics.register(Gauge('pos_db_pool_waiters', 'Requests waiting for a pooled connection.',
+                       callback=lambda: db_pool.stats()['waiters']))
+metrics.register(Gauge('pos_db_executor_in_flight', 'Database calls running on the executor threads.',
+                       callback=lambda: db_executor.in_flight))
+
+# Utility functions
+@contextmanager
+def db_connection():
+    """Borrow a pooled database connection for the duration of a block.
+
+    The connection always goes back to the pool, and any transaction that
+    was not committed inside the block is rolled back on return.
+    """
+    conn = db_pool.acquire()
+    discard = False
+    try:
+        yield conn
+    except (mariadb.InterfaceError, mariadb.OperationalError):
+        discard = True
+        raise
+    finally:
+        db_pool.release(conn, discard=discard)
+
+# Order item payloads
+def order_item_select(source='order_items'):
+    """Return the joined item payload SELECT over ``source``.
+
+    Closed items older than ``ARCHIVE_AFTER_DAYS`` live in
+    ``order_items_archive``, which has the same columns. Prices are cast to
+    DOUBLE in SQL so rows arrive as floats instead of ``Decimal``.
+    """
+    return f"""
+    SELECT 
+        oi.id,
+        oi.table_id,
+        oi.check_id,
+        oi.menu_id,
+        oi.quantity,
+        CAST(oi.unit_price AS DOUBLE) AS unit_price,
+        CAST(oi.subtotal AS DOUBLE) AS subtotal,
+        oi.status,
+        oi.notes,
+        oi.created_at,
+        oi.updated_at,
+        m.name as menu_name,
+        m.category as menu_category,
+        t.name as table_name
+    FROM {source} oi
+    JOIN menus m ON oi.menu_id = m.id
+    JOIN tables t ON oi.table_id = t.id
+"""
+
+ORDER_ITEM_SELECT = order_item_select()
+ARCHIVED_ITEM_SELECT = order_item_select('order_items_archive')
+
+def serialize_order_item(item):
+    """Convert a joined order item row into a JSON-friendly dict in place."""
+    item['created_at'] = item['created_at'].isoformat()
+    if item.get('updated_at') is not None:
+        item['updated_at'] = item['updated_at'].isoformat()
+    return item
+
+# Compact responses
+COMPACT_MIMETYPE = 'application/vnd.pos.compact+json'
+COMPACT_COLUMNS = (
+    'id', 'table_id', 'check_id', 'menu_id', 'quantity', 'unit_price', 'subtotal',
+    'status', 'notes', 'created_at', 'updated_at', 'version'
+)
+
+def wants_compact():
+    """Whether the client asked for the compact item layout.
+
+    Clients opt in with ``?format=compact`` or by preferring
+    ``application/vnd.pos.compact+json`` in ``Accept``.
+    """
+    if request.args.get('format') == 'compact':
+        return True
+    accept = request.accept_mimetypes
+    return accept[COMPACT_MIMETYPE] > accept['application/json']
+
+def compact_items(items):
+    """Dictionary-encode serialized item payloads.
+
+    Rows hold the ``COMPACT_COLUMNS`` values in order; menu and table names
+    are sent once in the ``menus`` and ``tables`` lookups keyed by id.
+    """
+    menus = {}
+    tables = {}
+    rows = []
+    for item in items:
+        menu_id = str(item['menu_id'])
+        if menu_id not in menus:
+            menus[menu_id] = {'name': item['menu_name'], 'category': item['menu_category']}
+        table_id = str(item['table_id'])
+        if table_id not in tables:
+            tables[table_id] = {'name': item['table_name']}
+        rows.append([item.get(column) for column in COMPACT_COLUMNS])
+    return {
+        'format': 'compact',
+        'columns': COMPACT_COLUMNS,
+        'rows': rows,
+        'menus': menus,
+        'tables': tables
+    }
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def encode_json(payload):
+    """Encode ``payload`` to bytes with orjson when installed, else compact ``json``."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode()
+
+def json_response(payload, mimetype='application/json'):
+    """Respond with ``payload`` serialized by ``encode_json``."""
+    response = Response(encode_json(payload), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+def items_response(items, **extra):
+    """Respond with ``items`` compact-encoded, merged with ``extra`` fields."""
+    return json_response(dict(compact_items(items), **extra), mimetype=COMPACT_MIMETYPE)
+
+def fetch_order_items(conn, item_ids):
+    """Fetch complete payloads for the given order item ids."""
+    if not item_ids:
+        return []
+    cursor = conn.cursor(dictionary=True)
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    cursor.execute(
+        ORDER_ITEM_SELECT + f" WHERE oi.id IN ({placeholders}) ORDER BY oi.id",
+        tuple(item_ids)
+    )
+    items = [serialize_order_item(item) for item in cursor.fetchall()]
+    cursor.close()
+    return items
+
+# Keyset pagination
+def encode_cursor(*values):
+    """Encode a keyset position as an opaque URL-safe token."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a ``(timestamp, id)`` token produced by ``encode_cursor``."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), int(item_id)
+    except (ValueError, TypeError):
+        raise InvalidUsage('Invalid cursor')
+
+# Prep stations
+CATEGORY_STATIONS = {category: station
+                     for station, categories in STATIONS.items()
+                     for category in categories}
+STATION_NAMES = sorted(set(STATIONS) | {DEFAULT_STATION})
+
+def station_for_category(category):
+    """Return the prep station that prepares items of ``category``."""
+    return CATEGORY_STATIONS.get(category, DEFAULT_STATION)
+
+def station_category_condition(station, column='m.category'):
+    """Return ``(sql, params)`` restricting ``column`` to a station's categories."""
+    if station not in STATION_NAMES:
+        raise InvalidUsage(f'Unknown station. Must be one of: {", ".join(STATION_NAMES)}')
+    if station == DEFAULT_STATION:
+        others = [category for category, owner in CATEGORY_STATIONS.items() if owner != station]
+        if not others:
+            return '', []
+        return f"AND {column} NOT IN ({', '.join(['%s'] * len(others))})", others
+    categories = STATIONS[station]
+    return f"AND {column} IN ({', '.join(['%s'] * len(categories))})", list(categories)
+
+# Socket.IO rooms
+UNSUBSCRIBED_ROOM = 'unsubscribed'
+VIEWS = ('kitchen', 'pos', 'dashboard', 'setup')
+ITEM_EVENTS = {
+    'new_orders', 'order_status_updated', 'order_item_deleted', 'order_updated',
+    'order_notes_updated', 'order_completed', 'order_items_renamed', 'board_rebuilt'
+}
+# Events that change table occupancy or the day's figures
+COUNT_EVENTS = {
+    'new_orders', 'order_status_updated', 'order_item_deleted', 'order_updated',
+    'order_completed'
+}
+VIEW_EVENTS = {
+    'table_updated': ('pos', 'dashboard', 'setup'),
+    'menu_updated': ('pos', 'setup')
+}
+
+def kitchen_room(station=None):
+    """Return the room of the kitchen feed, optionally for one station."""
+    return f'station:{station}' if station else 'view:kitchen'
+
+def route_event(event, payload):
+    """Yield ``(room, payload)`` pairs for one logical event.
+
+    Kitchen screens get full item payloads, station rooms and table rooms
+    only the items that concern them, and POS, dashboard and setup views a
+    light notification without items. Clients that never subscribed keep
+    receiving everything.
+    """
+    yield UNSUBSCRIBED_ROOM, payload
+    if event not in ITEM_EVENTS:
+        for view in VIEW_EVENTS.get(event, VIEWS):
+            yield f'view:{view}', payload
+        if payload.get('table_id') is not None:
+            yield f"table:{payload['table_id']}", payload
+        return
+    
+    yield kitchen_room(), payload
+    
+    items = payload.get('items')
+    if items is None:
+        # Item-less board events (rebuilds) reach every station
+        for station in STATION_NAMES:
+            yield kitchen_room(station), payload
+        return
+    
+    by_station = {}
+    by_table = {}
+    for item in items:
+        by_station.setdefault(station_for_category(item['menu_category']), []).append(item)
+        by_table.setdefault(item['table_id'], []).append(item)
+    for station, station_items in by_station.items():
+        yield kitchen_room(station), dict(
+            payload, items=station_items, item_ids=[item['id'] for item in station_items])
+    if payload.get('table_id') is not None:
+        by_table.setdefault(payload['table_id'], [])
+    for table_id, table_items in by_table.items():
+        yield f'table:{table_id}', dict(
+            payload, items=table_items, item_ids=[item['id'] for item in table_items])
+    
+    if event in COUNT_EVENTS:
+        summary = {key: value for key, value in payload.items() if key != 'items'}
+        for view in ('pos', 'dashboard', 'setup'):
+            yield f'view:{view}', summary
+
+# Realtime events
+MERGED_ROW_KEYS = ('items', 'menus', 'tables')
+# Per-event fields that no longer describe a coalesced message
+PER_EVENT_KEYS = ('item_id', 'table_id', 'status')
+
+def room_size(room, namespace='/'):
+    """Return the number of clients currently in ``room``."""
+    try:
+        return len(socketio.server.manager.rooms.get(namespace, {}).get(room, ()))
+    except AttributeError:
+        return 0
+
+def merge_payloads(merged, payload):
+    """Fold ``payload`` into ``merged`` for one (room, event) topic.
+
+    Items, menus and tables are merged by id with the newer payload
+    winning and item and table ids are unioned. Once two events are merged
+    the single ``item_id``, ``table_id`` and ``status`` are dropped, since
+    the items may have moved to different statuses; ``items`` is the
+    authoritative state. Every other key takes the latest value.
+    """
+    rows = {}
+    for key in MERGED_ROW_KEYS:
+        rows[key] = {row['id']: row for row in merged.get(key, ())}
+        for row in payload.get(key, ()):
+            rows[key][row['id']] = row
+    item_ids = list(merged.get('item_ids', ()))
+    for item_id in [payload.get('item_id'), *payload.get('item_ids', ())]:
+        if item_id is not None and item_id not in item_ids:
+            item_ids.append(item_id)
+    table_ids = list(merged.get('table_ids', ()))
+    if payload.get('table_id') is not None and payload['table_id'] not in table_ids:
+        table_ids.append(payload['table_id'])
+
+    merged.update(payload)
+    for key, by_id in rows.items():
+        if by_id or key in payload:
+            merged[key] = list(by_id.values())
+    if item_ids:
+        merged['item_ids'] = item_ids
+    if table_ids:
+        merged['table_ids'] = table_ids
+    merged['coalesced'] = merged.get('coalesced', 0) + 1
+    if merged['coalesced'] > 1:
+        for key in PER_EVENT_KEYS:
+            merged.pop(key, None)
+    return merged
+
+class EventBatcher:
+    """Coalesce outbound room messages over a short window.
+
+    The first event after an idle window is delivered to its rooms
+    immediately. Events arriving within ``window`` seconds of the last
+    delivery are merged per (room, event) topic with ``merge_payloads`` and
+    delivered together when the window closes. Each delivered message gets
+    the room's next ``seq``.
+    """
+
+    def __init__(self, sio, lock, window):
+        self._sio = sio
+        self._lock = lock
+        self.window = window
+        self._pending = {}
+        self._room_seqs = {}
+        self._last_flush = 0.0
+        self._timer_scheduled = False
+        self.events_in = 0
+        self.messages_out = 0
+
+    def room_seq(self, room):
+        """Return the sequence number of the last message sent to ``room``."""
+        return self._room_seqs.get(room, 0)
+
+    def _deliver(self, room, event, payload):
+        seq = self._room_seqs[room] = self._room_seqs.get(room, 0) + 1
+        self._sio.emit(event, dict(payload, seq=seq, room=room), to=room)
+        self.messages_out += 1
+        SOCKET_MESSAGES_TOTAL.inc(event)
+        SOCKET_RECIPIENTS.observe(room_size(room), event)
+
+    def add(self, event, messages):
+        """Queue ``(room, payload)`` messages of one event.
+
+        Must be called holding the stream lock.
+        """
+        messages = list(messages)
+        self.events_in += len(messages)
+        now = time.monotonic()
+        if not self._pending and (self.window <= 0 or now - self._last_flush >= self.window):
+            self._last_flush = now
+            for room, payload in messages:
+                self._deliver(room, event, payload)
+            return
+
+        for room, payload in messages:
+            merge_payloads(self._pending.setdefault((room, event), {}), payload)
+        if not self._timer_scheduled:
+            self._timer_scheduled = True
+            delay = max(self._last_flush + self.window - now, 0)
+            socketio.start_background_task(self._flush_after, delay)
+
+    def _flush_after(self, delay):
+        socketio.sleep(delay)
+        self.flush()
+
+    def flush(self):
+        """Deliver every pending topic now."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer_scheduled = False
+            self._last_flush = time.monotonic()
+            for (room, event), payload in pending.items():
+                self._deliver(room, event, payload)
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000,
+            'events_in': self.events_in,
+            'messages_out': self.messages_out,
+            'pending': len(self._pending)
+        }
+
+class EventStream:
+    """Sequenced, room-routed Socket.IO broadcasts.
+
+    Each logical event gets the next global ``revision``; item payloads in
+    ``items`` are stamped with it as their ``version``. ``router`` fans the
+    event out to rooms and the batcher coalesces and delivers the room
+    messages. Every room has its own ``seq`` that increases by exactly one
+    per delivered message, so a client can detect a gap in its feed.
+    ``epoch`` changes whenever the server restarts or the board is rebuilt.
+
+    Projections registered with ``subscribe`` see each event under the same
+    lock that assigns its revision, so a projection read while holding
+    ``lock`` is consistent with ``room_seq``: at worst a client re-applies
+    a message whose items the snapshot already contained.
+    """
+
+    def __init__(self, sio, router, batch_window=0.0):
+        self._router = router
+        self.lock = threading.RLock()
+        self.batcher = EventBatcher(sio, self.lock, batch_window)
+        self._revision = 0
+        self._subscribers = []
+        self.epoch = uuid.uuid4().hex
+        self.events_published = 0
+
+    @property
+    def revision(self):
+        return self._revision
+
+    def room_seq(self, room):
+        """Return the sequence number of the last message sent to ``room``."""
+        return self.batcher.room_seq(room)
+
+    def subscribe(self, callback):
+        """Register ``callback(event, payload)`` to run for every emit."""
+        self._subscribers.append(callback)
+
+    def new_epoch(self):
+        """Start a new epoch, forcing every client to resync."""
+        with self.lock:
+            self.epoch = uuid.uuid4().hex
+
+    def emit(self, event, payload):
+        """Publish ``payload`` under the next revision to its rooms."""
+        with self.lock:
+            self._revision += 1
+            self.events_published += 1
+            SOCKET_EVENTS_TOTAL.inc(event)
+            payload = dict(payload, revision=self._revision, epoch=self.epoch)
+            for item in payload.get('items', ()):
+                item['version'] = self._revision
+            for callback in self._subscribers:
+                callback(event, payload)
+            self.batcher.add(event, self._router(event, payload))
+        return payload
+
+    def stats(self):
+        return dict(self.batcher.stats(), events_published=self.events_published)
+
+
+event_stream = EventStream(socketio, route_event, batch_window=EVENT_BATCH_WINDOW_MS / 1000)
+
+# Active order board
+ACTIVE_STATUSES = (ORDER_STATUS['PENDING'], ORDER_STATUS['IN_PROGRESS'])
+
+class ActiveBoard:
+    """In-process projection of all pending and in-progress order items.
+
+    Items are keyed by table and item id. The board is loaded from the
+    database once and then kept current from the item payloads of every
+    event published on ``stream``, so reads never touch the database.
+
+    Payloads are read after their transaction commits, so two requests
+    racing on one item can publish in the opposite order. A payload whose
+    ``updated_at`` is older than the one the board already holds for the
+    item is ignored, and the last ``tombstone_limit`` completed or
+    cancelled items are remembered so a late payload cannot bring them
+    back. ``updated_at`` has one second resolution; payloads from the same
+    second are applied in publish order.
+    """
+
+    tombstone_limit = 10000
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._tables = {}
+        self._tombstones = OrderedDict()
+        self._loaded = False
+        stream.subscribe(self._on_event)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def _get(self, item):
+        table = self._tables.get(item['table_id'])
+        return table['items'].get(item['id']) if table else None
+
+    def _put(self, item):
+        table = self._tables.setdefault(item['table_id'], {
+            'table_id': item['table_id'],
+            'table_name': item['table_name'],
+            'items': {}
+        })
+        table['table_name'] = item['table_name']
+        table['items'][item['id']] = dict(item)
+        self._tombstones.pop(item['id'], None)
+
+    def _discard(self, item):
+        self._tombstones[item['id']] = (item['updated_at'], item['version'])
+        self._tombstones.move_to_end(item['id'])
+        while len(self._tombstones) > self.tombstone_limit:
+            self._tombstones.popitem(last=False)
+        table = self._tables.get(item['table_id'])
+        if table is None:
+            return
+        table['items'].pop(item['id'], None)
+        if not table['items']:
+            del self._tables[item['table_id']]
+
+    def _latest(self, item):
+        """Return ``(updated_at, version)`` the board holds for ``item``."""
+        current = self._get(item)
+        if current is not None:
+            return current['updated_at'], current['version']
+        return self._tombstones.get(item['id'])
+
+    def _on_event(self, event, payload):
+        for item in payload.get('items', ()):
+            latest = self._latest(item)
+            if latest is not None and item['updated_at'] < latest[0]:
+                continue
+            if item['status'] in ACTIVE_STATUSES:
+                self._put(item)
+            else:
+                self._discard(item)
+
+    def rebuild(self, conn=None):
+        """Reload the board from the database and start a new event epoch.
+
+        The query runs without the stream lock. Items that events changed
+        while it ran keep the newer of the two states when the result is
+        swapped in.
+        """
+        if conn is None:
+            with db_connection() as conn:
+                return self.rebuild(conn)
+        started = self._stream.revision
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(ORDER_ITEM_SELECT + """
+            WHERE oi.status IN ('pending', 'inprogress')
+        """)
+        items = [serialize_order_item(item) for item in cursor.fetchall()]
+        cursor.close()
+        with self._stream.lock:
+            fresh = {}
+            for item in items:
+                item['version'] = self._stream.revision
+                fresh[item['id']] = item
+            # Events published while the query ran win over its result
+            for table in self._tables.values():
+                for current in table['items'].values():
+                    loaded = fresh.get(current['id'])
+                    if current['version'] > started and (
+                            loaded is None or loaded['updated_at'] <= current['updated_at']):
+                        fresh[current['id']] = current
+            for item_id in list(fresh):
+                tombstone = self._tombstones.get(item_id)
+                if tombstone and tombstone[1] > started and fresh[item_id]['updated_at'] <= tombstone[0]:
+                    del fresh[item_id]
+            self._tables = {}
+            for item in fresh.values():
+                self._put(item)
+            self._loaded = True
+            self._stream.new_epoch()
+            self._stream.emit('board_rebuilt', {'items_count': len(fresh)})
+        return len(fresh)
+
+    def snapshot(self, station=None):
+        """Return ``(tables, room, seq, epoch)`` grouped like ``GET /api/orders``.
+
+        With ``station`` only that station's items are included, and ``seq``
+        belongs to the station's room.
+        """
+        if not self._loaded:
+            self.rebuild()
+        room = kitchen_room(station)
+        with self._stream.lock:
+            items = [dict(item) for table in self._tables.values()
+                     for item in table['items'].values()
+                     if station is None or station_for_category(item['menu_category']) == station]
+            seq = self._stream.room_seq(room)
+            epoch = self._stream.epoch
+        items.sort(key=lambda item: (item['created_at'], item['id']), reverse=True)
+        
+        # Group items by table
+        tables = {}
+        for item in items:
+            table_id = item['table_id']
+            if table_id not in tables:
+                tables[table_id] = {
+                    'table_id': table_id,
+                    'table_name': item['table_name'],
+                    'items': []
+                }
+            tables[table_id]['items'].append(item)
+        return list(tables.values()), room, seq, epoch
+
+    def rename(self, tables=None, menus=None):
+        """Apply table and menu renames and broadcast the affected items.
+
+        ``tables`` maps table id to name, ``menus`` maps menu id to a
+        ``(name, category)`` pair.
+        """
+        tables = tables or {}
+        menus = menus or {}
+        with self._stream.lock:
+            changed = []
+            for table in self._tables.values():
+                new_table_name = tables.get(table['table_id'], table['table_name'])
+                for item in table['items'].values():
+                    name, category = menus.get(
+                        item['menu_id'], (item['menu_name'], item['menu_category']))
+                    if (item['table_name'], item['menu_name'], item['menu_category']) != \
+                            (new_table_name, name, category):
+                        changed.append(dict(item, table_name=new_table_name,
+                                            menu_name=name, menu_category=category))
+            if changed:
+                self._stream.emit('order_items_renamed', {'items': changed})
+        return len(changed)
+
+
+active_board = ActiveBoard(event_stream)
+
+# Menu catalog
+class MenuCatalog:
+    """Cached menu catalog with a monotonically increasing version.
+
+    The catalog is read from the database once and then only reloaded when
+    ``update_menus`` calls ``bump``. The JSON body for ``GET /api/menus`` is
+    serialized once per version and identified by ``etag``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._menus = None
+        self._categories = None
+        self._body = None
+
+    @property
+    def etag(self):
+        return f'menus-{self._instance}-{self.version}'
+
+    def _load(self):
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, name, price, category, description, is_available 
+                FROM menus 
+                ORDER BY category, name
+            """)
+            menus = cursor.fetchall()
+        for menu in menus:
+            menu['price'] = float(menu['price'])
+        self._menus = menus
+        self._categories = list(dict.fromkeys(menu['category'] for menu in menus))
+        self._body = json.dumps(menus, ensure_ascii=False)
+
+    def get(self):
+        """Return ``(menus, categories, body, etag)`` for the current version."""
+        with self._lock:
+            if self._menus is None:
+                self._load()
+            return self._menus, self._categories, self._body, self.etag
+
+    def bump(self):
+        """Reload the catalog under a new version and return that version."""
+        with self._lock:
+            self.version += 1
+            self._load()
+            return self.version
+
+
+menu_catalog = MenuCatalog()
+
+# Business day ranges
+def business_day_range(now=None):
+    """Return the half-open ``[start, end)`` of the business day containing ``now``.
+
+    A business day starts at ``BUSINESS_DAY_CUTOFF_HOUR``, so with a cutoff of
+    4 an order at 01:30 still counts towards the previous evening. Comparing
+    ``created_at`` against both bounds lets MariaDB use
+    ``idx_orderitem_created``, unlike ``DATE(created_at) = CURDATE()``.
+    """
+    now = now or datetime.now()
+    start = now.replace(hour=BUSINESS_DAY_CUTOFF_HOUR, minute=0, second=0, microsecond=0)
+    if now < start:
+        start -= timedelta(days=1)
+    return start, start + timedelta(days=1)
+
+# Short-lived shared results
+class CachedValue:
+    """A value recomputed at most once per ``ttl`` seconds.
+
+    Concurrent readers of an expired value wait for a single computation
+    instead of each running their own. ``invalidate`` never blocks, so it
+    is safe to call from event callbacks.
+    """
+
+    def __init__(self, loader, ttl):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0.0
+        self._generation = 0
+        self._value_generation = -1
+
+    def get(self):
+        with self._lock:
+            if (self._value is None or self._value_generation != self._generation
+                    or time.monotonic() >= self._expires):
+                generation = self._generation
+                self._value = self._loader()
+                self._value_generation = generation
+                self._expires = time.monotonic() + self.ttl
+            return self._value
+
+    def invalidate(self, *args):
+        self._generation += 1
+
 # Custom exception class
 class InvalidUsage(Exception):
     def __init__(self, message, status_code=400):
@@ -74,6 +1391,14 @@ class OrderItemSchema(Schema):
 
 order_item_schema = OrderItemSchema()
 
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_.:-]{8,64}$')
+
+class OrderReplayEntrySchema(Schema):
+    idempotency_key = fields.Str(required=True, validate=validate.Regexp(IDEMPOTENCY_KEY_PATTERN))
+    items = fields.List(fields.Nested(OrderItemSchema), required=True, validate=validate.Length(min=1))
+
+order_replay_entry_schema = OrderReplayEntrySchema()
+
 class OrderCompleteSchema(Schema):
     table_id = fields.Int(required=True)
     items = fields.List(fields.Dict(), required=True)
@@ -81,6 +1406,887 @@ class OrderCompleteSchema(Schema):
 
 order_complete_schema = OrderCompleteSchema()
 
+class OrderStatusBatchSchema(Schema):
+    status = fields.Str(required=True, validate=validate.OneOf(list(ORDER_STATUS.values())))
+    item_ids = fields.List(fields.Int(), validate=validate.Length(min=1))
+    table_id = fields.Int()
+    from_status = fields.List(fields.Str(validate=validate.OneOf(list(ORDER_STATUS.values()))))
+
+    @validates_schema
+    def validate_target(self, data, **kwargs):
+        if ('item_ids' in data) == ('table_id' in data):
+            raise ValidationError('Provide either item_ids or table_id')
+
+order_status_batch_schema = OrderStatusBatchSchema()
+
+class MenuUpdateSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    id = fields.Int(allow_none=True)
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=100))
+    price = fields.Decimal(required=True, places=2, validate=validate.Range(min=0))
+    category = fields.Str(required=True, validate=validate.Length(min=1, max=50))
+    description = fields.Str(allow_none=True, load_default=None)
+    is_available = fields.Bool(load_default=True)
+
+menu_update_schema = MenuUpdateSchema(many=True)
+
+class TableUpdateSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    id = fields.Int(allow_none=True)
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=50))
+
+table_update_schema = TableUpdateSchema(many=True)
+
+# Table active item counters
+def active_item_deltas(changes):
+    """Sum per-table changes in active item count.
+
+    ``changes`` yields ``(table_id, old_status, new_status)`` tuples, with
+    ``old_status`` ``None`` for newly inserted items.
+    """
+    deltas = {}
+    for table_id, old_status, new_status in changes:
+        delta = (new_status in ACTIVE_STATUSES) - (old_status in ACTIVE_STATUSES)
+        if delta:
+            deltas[table_id] = deltas.get(table_id, 0) + delta
+    return {table_id: delta for table_id, delta in deltas.items() if delta}
+
+def apply_table_deltas(cursor, deltas):
+    """Adjust ``tables.active_items`` and ``tables.status`` in one statement.
+
+    Runs once per write statement instead of once per changed row. Table
+    rows are touched in id order so concurrent writers lock them
+    consistently. A table with an open check stays occupied after its
+    last item is served, until checkout closes the check.
+    """
+    if not deltas:
+        return
+    table_ids = sorted(deltas)
+    cases = ' '.join(['WHEN %s THEN %s'] * len(table_ids))
+    placeholders = ', '.join(['%s'] * len(table_ids))
+    params = [value for table_id in table_ids for value in (table_id, deltas[table_id])]
+    cursor.execute(f"""
+        UPDATE tables
+        SET active_items = active_items + CASE id {cases} END,
+            status = IF(active_items > 0 OR current_check_id IS NOT NULL, 'occupied', 'available')
+        WHERE id IN ({placeholders})
+        ORDER BY id
+    """, (*params, *table_ids))
+
+def lock_tables(cursor, table_ids):
+    """Lock the given table rows in id order.
+
+    Every writer locks table rows before order item rows, so checkout,
+    status changes and new orders on the same table queue instead of
+    deadlocking.
+    """
+    table_ids = sorted(set(table_ids))
+    if not table_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(table_ids))
+    cursor.execute(
+        f"SELECT id FROM tables WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE",
+        tuple(table_ids)
+    )
+    cursor.fetchall()
+
+def set_order_items_status(conn, new_status, item_ids=None, table_id=None, from_statuses=None):
+    """Lock the matching order items and move them to ``new_status``.
+
+    Items are selected by ``item_ids`` and/or ``table_id`` and optionally
+    restricted to ``from_statuses``. The change is applied with one UPDATE
+    and the table counters and sales rollups are adjusted once. Returns ``(previous,
+    changed)``: the previous status of every matched item and the ids that
+    actually changed. The caller owns the transaction.
+
+    The owning table rows are locked before the items, the same order
+    checkout and new orders use.
+    """
+    conditions = []
+    params = []
+    if item_ids is not None:
+        conditions.append(f"id IN ({', '.join(['%s'] * len(item_ids))})")
+        params.extend(item_ids)
+    if table_id is not None:
+        conditions.append("table_id = %s")
+        params.append(table_id)
+    if from_statuses:
+        conditions.append(f"status IN ({', '.join(['%s'] * len(from_statuses))})")
+        params.extend(from_statuses)
+    
+    cursor = conn.cursor()
+    if table_id is not None:
+        lock_tables(cursor, [table_id])
+    else:
+        # An item never moves to another table, so an unlocked read is
+        # enough to know which table rows to lock
+        cursor.execute(f"SELECT DISTINCT table_id FROM order_items WHERE {' AND '.join(conditions)}",
+                       tuple(params))
+        lock_tables(cursor, [row[0] for row in cursor.fetchall()])
+    
+    cursor.execute(f"""
+        SELECT id, table_id, status, menu_id, quantity, subtotal, created_at
+        FROM order_items
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+        FOR UPDATE
+    """, tuple(params))
+    rows = cursor.fetchall()
+    
+    previous = {row[0]: row[2] for row in rows}
+    changed_rows = [row for row in rows if row[2] != new_status]
+    changed = [row[0] for row in changed_rows]
+    if changed:
+        placeholders = ', '.join(['%s'] * len(changed))
+        cursor.execute(
+            f"UPDATE order_items SET status = %s WHERE id IN ({placeholders})",
+            (new_status, *changed)
+        )
+        apply_table_deltas(cursor, active_item_deltas(
+            (row_table_id, status, new_status) for _, row_table_id, status, *_ in changed_rows
+        ))
+        apply_sales_deltas(cursor, sales_rollup_deltas(
+            (created_at, menu_id, row_table_id, quantity, subtotal, status, new_status)
+            for _, row_table_id, status, menu_id, quantity, subtotal, created_at in changed_rows
+        ))
+    cursor.close()
+    return previous, changed
+
+def verify_table_counters(conn, repair=False):
+    """Compare ``tables.active_items`` with the real active item counts.
+
+    Returns the mismatching tables. With ``repair`` the counters and table
+    statuses are rewritten from the real counts and committed. Table rows
+    are locked first, so concurrent writers queue behind the check and
+    apply their own deltas on top of the repaired values.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, name, status, active_items, current_check_id FROM tables
+        ORDER BY id
+        FOR UPDATE
+    """)
+    tables = cursor.fetchall()
+    cursor.execute("""
+        SELECT table_id, COUNT(*) as active_items
+        FROM order_items
+        WHERE status IN ('pending', 'inprogress')
+        GROUP BY table_id
+    """)
+    actual = {row['table_id']: row['active_items'] for row in cursor.fetchall()}
+    
+    mismatches = []
+    for table in tables:
+        expected = actual.get(table['id'], 0)
+        expected_status = 'occupied' if expected > 0 or table['current_check_id'] else 'available'
+        if table['active_items'] != expected or table['status'] != expected_status:
+            mismatches.append({
+                'table_id': table['id'],
+                'table_name': table['name'],
+                'active_items': table['active_items'],
+                'expected_active_items': expected,
+                'status': table['status'],
+                'expected_status': expected_status
+            })
+    
+    if repair and mismatches:
+        for mismatch in mismatches:
+            cursor.execute("""
+                UPDATE tables SET active_items = %s, status = %s WHERE id = %s
+            """, (
+                mismatch['expected_active_items'],
+                mismatch['expected_status'],
+                mismatch['table_id']
+            ))
+        conn.commit()
+    cursor.close()
+    return mismatches
+
+# Sales rollups
+SALES_ROLLUP_COLUMNS = (
+    'completed_items', 'completed_quantity', 'completed_sales',
+    'cancelled_items', 'cancelled_quantity', 'cancelled_sales'
+)
+
+def sales_rollup_vector(status, items, quantity, sales):
+    """The rollup columns ``items`` items in ``status`` contribute to."""
+    if status == ORDER_STATUS['COMPLETED']:
+        return (items, quantity, sales, 0, 0, 0)
+    if status == ORDER_STATUS['CANCELLED']:
+        return (0, 0, 0, items, quantity, sales)
+    return (0, 0, 0, 0, 0, 0)
+
+def sales_rollup_deltas(changes):
+    """Sum rollup changes per ``(bucket_hour, menu_id, table_id)``.
+
+    ``changes`` yields ``(created_at, menu_id, table_id, quantity,
+    subtotal, old_status, new_status)`` tuples. Items are bucketed by the
+    hour they were ordered in, like the other sales figures.
+    """
+    deltas = {}
+    for created_at, menu_id, table_id, quantity, subtotal, old_status, new_status in changes:
+        key = (created_at.replace(minute=0, second=0, microsecond=0), menu_id, table_id)
+        added = sales_rollup_vector(new_status, 1, quantity, subtotal)
+        removed = sales_rollup_vector(old_status, 1, quantity, subtotal)
+        current = deltas.get(key, (0,) * len(SALES_ROLLUP_COLUMNS))
+        deltas[key] = tuple(c + a - r for c, a, r in zip(current, added, removed))
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+def apply_sales_deltas(cursor, deltas):
+    """Add ``deltas`` to ``sales_rollup_hourly`` with multi-row upserts.
+
+    Rows are written in key order so concurrent writers lock them
+    consistently. The caller owns the transaction.
+    """
+    keys = sorted(deltas)
+    columns = ', '.join(SALES_ROLLUP_COLUMNS)
+    updates = ', '.join(f'{column} = {column} + VALUES({column})' for column in SALES_ROLLUP_COLUMNS)
+    row = '(' + ', '.join(['%s'] * (3 + len(SALES_ROLLUP_COLUMNS))) + ')'
+    for start in range(0, len(keys), ORDER_INSERT_BATCH_SIZE):
+        batch = keys[start:start + ORDER_INSERT_BATCH_SIZE]
+        cursor.execute(f"""
+            INSERT INTO sales_rollup_hourly (bucket_hour, menu_id, table_id, {columns})
+            VALUES {', '.join([row] * len(batch))}
+            ON DUPLICATE KEY UPDATE {updates}
+        """, tuple(value for key in batch for value in (*key, *deltas[key])))
+
+def rebuild_sales_rollups(start, end):
+    """Recompute ``sales_rollup_hourly`` for ``[start, end)`` from the items.
+
+    Works one business day per transaction over ``order_items`` and
+    ``order_items_archive``. The source rows are share-locked before the
+    rollup rows are replaced, the same order live status changes take
+    their locks in, so concurrent changes are neither lost nor counted
+    twice. Returns the number of rollup rows written.
+    """
+    written = 0
+    day = start
+    while day < end:
+        day_end = min(day + timedelta(days=1), end)
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            totals = {}
+            for source in ('order_items', 'order_items_archive'):
+                cursor.execute(f"""
+                    SELECT DATE(created_at), HOUR(created_at), menu_id, table_id, status,
+                        COUNT(*), SUM(quantity), SUM(subtotal)
+                    FROM {source}
+                    WHERE created_at >= %s AND created_at < %s
+                    AND status IN (%s, %s)
+                    GROUP BY DATE(created_at), HOUR(created_at), menu_id, table_id, status
+                    LOCK IN SHARE MODE
+                """, (day, day_end, ORDER_STATUS['COMPLETED'], ORDER_STATUS['CANCELLED']))
+                for date, hour, menu_id, table_id, status, items, quantity, sales in cursor.fetchall():
+                    key = (datetime(date.year, date.month, date.day, hour), menu_id, table_id)
+                    current = totals.get(key, (0,) * len(SALES_ROLLUP_COLUMNS))
+                    added = sales_rollup_vector(status, items, quantity, sales)
+                    totals[key] = tuple(c + a for c, a in zip(current, added))
+            
+            cursor.execute("""
+                DELETE FROM sales_rollup_hourly
+                WHERE bucket_hour >= %s AND bucket_hour < %s
+            """, (day, day_end))
+            apply_sales_deltas(cursor, totals)
+            conn.commit()
+            cursor.close()
+        written += len(totals)
+        day = day_end
+    return written
+
+# Order history export
+EXPORT_COLUMNS = (
+    'id', 'created_at', 'updated_at', 'table_id', 'table_name', 'check_id',
+    'menu_id', 'menu_name', 'menu_category', 'quantity', 'unit_price',
+    'subtotal', 'status', 'notes'
+)
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_FETCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def encode_export_rows(rows, fmt):
+    """Encode fetched item rows as CSV lines or NDJSON records."""
+    if fmt == 'ndjson':
+        return b''.join(encode_json({column: row[column] for column in EXPORT_COLUMNS}) + b'\n'
+                        for row in rows)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+    return text.getvalue().encode()
+
+def export_order_items(start, end, fmt='csv', statuses=None, compress=False):
+    """Stream the items created in ``[start, end)`` as CSV or NDJSON chunks.
+
+    Archived items come first, then those still in ``order_items``, each
+    in ``(created_at, id)`` order. Both are read in one read-only
+    transaction, so items the archival job moves meanwhile appear exactly
+    once, and through an unbuffered cursor in batches of
+    ``EXPORT_FETCH_SIZE``, so memory stays flat however long the range.
+    With ``compress`` the output is gzipped on the fly.
+
+    The connection is borrowed and the first query runs before this
+    returns, so pool and query errors reach the caller instead of
+    truncating the stream. The connection is held until the returned
+    generator is exhausted or closed.
+    """
+    conditions = ['oi.created_at >= %s', 'oi.created_at < %s']
+    params = [start, end]
+    if statuses:
+        conditions.append(f"oi.status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    query = " WHERE {} ORDER BY oi.created_at, oi.id".format(' AND '.join(conditions))
+    
+    def generate():
+        conn = db_pool.acquire()
+        finished = False
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            cursor.execute("START TRANSACTION READ ONLY")
+            encoder = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+            chunk = (','.join(EXPORT_COLUMNS) + '\r\n').encode() if fmt == 'csv' else b''
+            for select in (ARCHIVED_ITEM_SELECT, ORDER_ITEM_SELECT):
+                cursor.execute(select + query, tuple(params))
+                if select is ARCHIVED_ITEM_SELECT:
+                    # Hand control back once the first query has succeeded
+                    yield None
+                while True:
+                    rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    chunk += encode_export_rows(rows, fmt)
+                    if len(chunk) >= EXPORT_CHUNK_BYTES:
+                        chunk = encoder.compress(chunk) if encoder else chunk
+                        if chunk:
+                            yield chunk
+                        chunk = b''
+            if encoder:
+                chunk = encoder.compress(chunk) + encoder.flush()
+            if chunk:
+                yield chunk
+            cursor.close()
+            finished = True
+        finally:
+            # A stream abandoned mid-result leaves unread rows on the connection
+            db_pool.release(conn, discard=not finished)
+    
+    chunks = generate()
+    next(chunks)
+    return chunks
+
+# Archival of closed order items
+ARCHIVED_COLUMNS = """
+    id, table_id, check_id, menu_id, quantity, unit_price, subtotal,
+    status, notes, created_at, updated_at
+"""
+
+def archive_closed_items(older_than_days=None, batch_size=None, pause=None):
+    """Move closed order items into ``order_items_archive``.
+
+    Completed and cancelled items whose last change is older than
+    ``older_than_days`` are copied and deleted in batches of ``batch_size``,
+    each in its own short transaction that only locks the moved rows by
+    primary key. The newest item is never moved, so the auto-increment
+    position always stays in ``order_items``. Returns the number moved.
+    """
+    older_than_days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    pause = ARCHIVE_BATCH_PAUSE if pause is None else pause
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Find candidates with a plain read, then lock them by primary key
+            cursor.execute("""
+                SELECT id FROM order_items
+                WHERE updated_at < %s
+                AND status IN ('completed', 'cancelled')
+                AND id < (SELECT MAX(id) FROM order_items)
+                ORDER BY updated_at
+                LIMIT %s
+            """, (cutoff, batch_size))
+            candidates = [row[0] for row in cursor.fetchall()]
+            if not candidates:
+                break
+            
+            placeholders = ', '.join(['%s'] * len(candidates))
+            cursor.execute(f"""
+                SELECT id FROM order_items
+                WHERE id IN ({placeholders})
+                AND status IN ('completed', 'cancelled')
+                FOR UPDATE
+            """, tuple(candidates))
+            item_ids = [row[0] for row in cursor.fetchall()]
+            
+            if item_ids:
+                placeholders = ', '.join(['%s'] * len(item_ids))
+                cursor.execute(f"""
+                    INSERT INTO order_items_archive ({ARCHIVED_COLUMNS})
+                    SELECT {ARCHIVED_COLUMNS}
+                    FROM order_items
+                    WHERE id IN ({placeholders})
+                """, tuple(item_ids))
+                cursor.execute(
+                    f"DELETE FROM order_items WHERE id IN ({placeholders})",
+                    tuple(item_ids)
+                )
+                conn.commit()
+                moved += len(item_ids)
+        
+        if len(candidates) < batch_size:
+            break
+        socketio.sleep(pause)
+    return moved
+
+def archive_worker():
+    """Background task that periodically archives items and purges old idempotency keys."""
+    while True:
+        socketio.sleep(ARCHIVE_INTERVAL)
+        try:
+            moved = archive_closed_items()
+            if moved:
+                app.logger.info(f"Archived {moved} closed order items")
+            purged = purge_idempotency_keys()
+            if purged:
+                app.logger.info(f"Purged {purged} expired idempotency keys")
+        except Exception as e:
+            app.logger.error(f"Error archiving order items: {str(e)}")
+
+def start_archive_worker():
+    """Start the archival background task unless ``ARCHIVE_INTERVAL`` is 0."""
+    if ARCHIVE_INTERVAL > 0:
+        socketio.start_background_task(archive_worker)
+
+# Static assets
+ASSET_SOURCE_DIRS = ('css', 'js')
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+class AssetManifest:
+    """Map asset source paths to their fingerprinted builds.
+
+    ``flask build-assets`` writes the builds and ``manifest.json`` into
+    ``directory``. Without a manifest, or in debug mode, templates link the
+    source files under ``static/`` instead.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def load(self):
+        """(Re)read the manifest and return the number of entries."""
+        try:
+            with open(os.path.join(self.directory, 'manifest.json')) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        with self._lock:
+            self._entries = entries
+        return len(entries)
+
+    def get(self, source):
+        if self._entries is None:
+            self.load()
+        return self._entries.get(source)
+
+# Kept outside static/ so a bind-mounted static/ does not hide the build
+asset_manifest = AssetManifest(os.path.join(app.root_path, 'dist'))
+
+@app.template_global()
+def asset_url(source):
+    """URL of a static asset, fingerprinted when it has been built."""
+    built = None if app.debug else asset_manifest.get(source)
+    if built is None:
+        return url_for('static', filename=source)
+    return url_for('serve_asset', filename=built)
+
+def build_assets(static_dir, out_dir):
+    """Write fingerprinted copies of the CSS and JS sources with compressed variants.
+
+    Every file under ``static/css`` and ``static/js`` is copied to
+    ``out_dir`` as ``name.<hash>.ext`` next to ``.gz`` and, when brotli is
+    installed, ``.br`` variants at maximum compression. ``out_dir`` is
+    replaced as a whole. Returns the manifest.
+    """
+    manifest = {}
+    staging = out_dir + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    for source_dir in ASSET_SOURCE_DIRS:
+        for name in sorted(os.listdir(os.path.join(static_dir, source_dir))):
+            source = f'{source_dir}/{name}'
+            with open(os.path.join(static_dir, source), 'rb') as f:
+                data = f.read()
+            root, ext = os.path.splitext(source)
+            target = f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            path = os.path.join(staging, target)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            variants = {'': data, '.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data, quality=11)
+            for suffix, body in variants.items():
+                with open(path + suffix, 'wb') as f:
+                    f.write(body)
+            manifest[source] = target
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.rename(staging, out_dir)
+    return manifest
+
+# Startup warm-up
+def warm_templates():
+    """Compile every template into the Jinja cache."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+def warm_tables():
+    """Read the table list once so its pages and rows are in the buffer pool."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, name, status, active_items, current_check_id, created_at
+            FROM tables
+            ORDER BY id
+        """)
+        cursor.fetchall()
+        cursor.close()
+
+class WarmUp:
+    """Run the startup warm-up steps and report readiness.
+
+    Each attempt runs every step in order and records its duration. A
+    failed attempt is retried every ``retry_interval`` seconds until one
+    completes, and only then is the process ``ready``.
+    """
+
+    def __init__(self, steps, retry_interval):
+        self._steps = steps
+        self.retry_interval = retry_interval
+        self.ready = False
+        self.attempts = 0
+        self.timings = {}
+        self.error = None
+
+    def run(self):
+        while not self.ready:
+            self.attempts += 1
+            name = None
+            try:
+                for name, step in self._steps:
+                    started = time.perf_counter()
+                    step()
+                    self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+                self.error = None
+                self.ready = True
+                app.logger.info(f"Warm-up finished: {self.timings}")
+            except Exception as e:
+                self.error = f'{name}: {e}'
+                app.logger.error(f"Warm-up step {name} failed, retrying: {str(e)}")
+                socketio.sleep(self.retry_interval)
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'attempts': self.attempts,
+            'timings_ms': dict(self.timings),
+            'error': self.error
+        }
+
+warm_up = WarmUp((
+    ('connections', lambda: db_pool.warm(DB_POOL_WARM)),
+    ('templates', warm_templates),
+    ('assets', asset_manifest.load),
+    ('menus', menu_catalog.get),
+    ('tables', warm_tables),
+    ('board', active_board.rebuild)
+), WARMUP_RETRY_INTERVAL)
+metrics.register(Gauge('pos_ready', 'Whether the startup warm-up has finished.',
+                       callback=lambda: int(warm_up.ready)))
+
+def start_background_services():
+    """Start the warm-up and the background workers.
+
+    Called once per serving process, by ``__main__`` for the development
+    server (in the reloader's serving child only) and from
+    ``post_worker_init`` in gunicorn.conf.py. The warm-up
+    runs as a background task, so ``/healthz`` answers at once while
+    ``/readyz`` waits for it.
+    """
+    socketio.start_background_task(warm_up.run)
+    start_archive_worker()
+
+# Table checks
+def open_table_checks(cursor, table_ids):
+    """Return ``{table_id: check_id}`` of the open checks, opening missing ones.
+
+    The caller must already hold the table rows' locks (``apply_table_deltas``
+    takes them), so concurrent orders cannot open two checks for one table.
+    Unknown table ids are left out.
+    """
+    table_ids = sorted(set(table_ids))
+    placeholders = ', '.join(['%s'] * len(table_ids))
+    cursor.execute(
+        f"SELECT id, current_check_id FROM tables WHERE id IN ({placeholders})", tuple(table_ids))
+    checks = dict(cursor.fetchall())
+    missing = sorted(table_id for table_id, check_id in checks.items() if check_id is None)
+    if missing:
+        cursor.execute(f"""
+            INSERT INTO table_checks (table_id)
+            VALUES {', '.join(['(%s)'] * len(missing))}
+            RETURNING id, table_id
+        """, tuple(missing))
+        opened = {table_id: check_id for check_id, table_id in cursor.fetchall()}
+        cases = ' '.join(['WHEN %s THEN %s'] * len(opened))
+        params = [value for table_id in missing for value in (table_id, opened[table_id])]
+        cursor.execute(f"""
+            UPDATE tables
+            SET current_check_id = CASE id {cases} END
+            WHERE id IN ({', '.join(['%s'] * len(missing))})
+            ORDER BY id
+        """, (*params, *missing))
+        checks.update(opened)
+    return checks
+
+def close_table_check(cursor, table_id):
+    """Close the table's open check and return its id, or ``None``.
+
+    Locks the table row first, so orders arriving during checkout wait and
+    then open a new check instead of joining the one being closed. The
+    table becomes available unless it still has active items.
+    """
+    cursor.execute("SELECT current_check_id FROM tables WHERE id = %s FOR UPDATE", (table_id,))
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    cursor.execute(
+        "UPDATE table_checks SET status = 'closed', closed_at = NOW() WHERE id = %s", (row[0],))
+    cursor.execute("""
+        UPDATE tables
+        SET current_check_id = NULL,
+            status = IF(active_items > 0, 'occupied', 'available')
+        WHERE id = %s
+    """, (table_id,))
+    return row[0]
+
+def serialize_check(check):
+    """Convert a ``table_checks`` row into a JSON-friendly dict in place."""
+    for key in ('opened_at', 'closed_at'):
+        if check.get(key) is not None:
+            check[key] = check[key].isoformat()
+    return check
+
+# Order ingestion
+ORDER_INSERT_BATCH_SIZE = 500
+
+def insert_order_items(conn, items):
+    """Insert validated order items with set-based statements.
+
+    Prices for every referenced menu are fetched with a single lookup and
+    the rows go in as multi-row INSERTs, so a batch costs a few round trips
+    instead of two per item. Table counters are adjusted once per batch
+    and each item joins its table's open check, which the first order at a
+    free table opens. Returns the created ids in input order. The caller
+    owns the transaction.
+    """
+    cursor = conn.cursor()
+    
+    # Take the table row locks before the inserts' foreign key checks do,
+    # so concurrent orders for one table queue instead of deadlocking
+    apply_table_deltas(cursor, active_item_deltas(
+        (item['table_id'], None, ORDER_STATUS['PENDING']) for item in items
+    ))
+    checks = open_table_checks(cursor, (item['table_id'] for item in items))
+    
+    # Get menu prices to ensure price integrity
+    menu_ids = sorted({item['menu_id'] for item in items})
+    placeholders = ', '.join(['%s'] * len(menu_ids))
+    cursor.execute(f"SELECT id, price FROM menus WHERE id IN ({placeholders})", tuple(menu_ids))
+    prices = dict(cursor.fetchall())
+    missing = [menu_id for menu_id in menu_ids if menu_id not in prices]
+    if missing:
+        raise InvalidUsage(f"Menu item {', '.join(map(str, missing))} not found")
+    
+    created_items = []
+    for start in range(0, len(items), ORDER_INSERT_BATCH_SIZE):
+        batch = items[start:start + ORDER_INSERT_BATCH_SIZE]
+        params = []
+        for item in batch:
+            params.extend((
+                item['table_id'],
+                checks.get(item['table_id']),
+                item['menu_id'],
+                item['quantity'],
+                prices[item['menu_id']],  # Use price from menu
+                item.get('notes')
+            ))
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))
+        cursor.execute(f"""
+            INSERT INTO order_items 
+            (table_id, check_id, menu_id, quantity, unit_price, notes)
+            VALUES {values}
+            RETURNING id
+        """, tuple(params))
+        created_items.extend(row[0] for row in cursor.fetchall())
+    
+    cursor.close()
+    return created_items
+
+# Setup list saves
+MENU_COLUMNS = ('name', 'price', 'category', 'description', 'is_available')
+TABLE_COLUMNS = ('name',)
+
+def apply_row_diff(cursor, table, columns, rows):
+    """Write only the real changes of a submitted list of ``table`` rows.
+
+    ``rows`` are dicts with ``columns`` and an optional ``id``. Rows with
+    an id are compared with the stored values, and only those that differ
+    are written, by one UPDATE mapping each column through ``CASE id`` so
+    unchanged rows are neither locked nor touched. Rows without an id go in
+    as one multi-row INSERT. Ids that no longer exist are skipped. Returns
+    ``(created_ids, updated_ids, unchanged, missing_ids)``. The caller owns
+    the transaction.
+    """
+    submitted = {}
+    new_rows = []
+    for row in rows:
+        values = tuple(row[column] for column in columns)
+        if row.get('id'):
+            submitted[row['id']] = values
+        else:
+            new_rows.append(values)
+    
+    current = {}
+    if submitted:
+        placeholders = ', '.join(['%s'] * len(submitted))
+        cursor.execute(f"""
+            SELECT id, {', '.join(columns)} FROM {table}
+            WHERE id IN ({placeholders})
+        """, tuple(submitted))
+        current = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+    missing = sorted(row_id for row_id in submitted if row_id not in current)
+    updated = sorted(row_id for row_id, values in submitted.items()
+                     if row_id in current and values != current[row_id])
+    
+    if updated:
+        cases = ' '.join(['WHEN %s THEN %s'] * len(updated))
+        assignments = ', '.join(f'{column} = CASE id {cases} END' for column in columns)
+        params = [value for index in range(len(columns))
+                  for row_id in updated for value in (row_id, submitted[row_id][index])]
+        placeholders = ', '.join(['%s'] * len(updated))
+        cursor.execute(f"""
+            UPDATE {table} SET {assignments}
+            WHERE id IN ({placeholders})
+            ORDER BY id
+        """, (*params, *updated))
+    
+    created = []
+    if new_rows:
+        row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES {', '.join([row] * len(new_rows))}
+            RETURNING id
+        """, tuple(value for values in new_rows for value in values))
+        created = [row[0] for row in cursor.fetchall()]
+    
+    return created, updated, len(submitted) - len(updated) - len(missing), missing
+
+def fetch_rows(conn, table, columns, row_ids):
+    """Fetch ``{id: row}`` for the given ids of ``table``."""
+    if not row_ids:
+        return {}
+    cursor = conn.cursor(dictionary=True)
+    placeholders = ', '.join(['%s'] * len(row_ids))
+    cursor.execute(
+        f"SELECT id, {', '.join(columns)} FROM {table} WHERE id IN ({placeholders})",
+        tuple(row_ids)
+    )
+    rows = {row['id']: row for row in cursor.fetchall()}
+    cursor.close()
+    return rows
+
+# Idempotency keys
+def order_request_hash(items):
+    """Hash validated order items so a reused key can be told apart."""
+    normalized = [
+        [item['table_id'], item['menu_id'], item['quantity'], item.get('notes')]
+        for item in items
+    ]
+    return hashlib.sha256(
+        json.dumps(normalized, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def claim_idempotency_key(conn, key, request_hash):
+    """Reserve ``key`` for an order inside the caller's transaction.
+
+    Returns ``None`` when the key is new. Otherwise returns the item ids
+    recorded by the order that first used it. A concurrent request holding
+    the same key blocks on its row until that request commits or rolls
+    back, so an order is never created twice. Raises ``InvalidUsage``
+    (422) when the key was first used for a different order.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT IGNORE INTO order_idempotency_keys (idempotency_key, request_hash) VALUES (%s, %s)",
+        (key, request_hash)
+    )
+    if cursor.rowcount == 1:
+        cursor.close()
+        return None
+    # Locking read: sees the committed row even inside an older snapshot
+    cursor.execute("""
+        SELECT item_ids, request_hash FROM order_idempotency_keys
+        WHERE idempotency_key = %s
+        LOCK IN SHARE MODE
+    """, (key,))
+    row = cursor.fetchone()
+    cursor.close()
+    # Keys stored before request hashes were recorded have none to compare
+    if row and row[1] is not None and row[1] != request_hash:
+        raise InvalidUsage('Idempotency key was already used for a different order',
+                           status_code=422)
+    return json.loads(row[0]) if row and row[0] else []
+
+def record_idempotency_key(conn, key, item_ids):
+    """Store the item ids created under a key claimed by ``claim_idempotency_key``."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE order_idempotency_keys SET item_ids = %s WHERE idempotency_key = %s",
+        (json.dumps(item_ids), key)
+    )
+    cursor.close()
+
+def purge_idempotency_keys(ttl_hours=None, batch_size=1000):
+    """Delete keys older than ``IDEMPOTENCY_KEY_TTL_HOURS``; returns the count."""
+    ttl_hours = IDEMPOTENCY_KEY_TTL_HOURS if ttl_hours is None else ttl_hours
+    cutoff = datetime.now() - timedelta(hours=ttl_hours)
+    purged = 0
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute(
+                "DELETE FROM order_idempotency_keys WHERE created_at < %s LIMIT %s",
+                (cutoff, batch_size)
+            )
+            conn.commit()
+            purged += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+        cursor.close()
+    return purged
+
+def request_idempotency_key(data):
+    """Return the request's idempotency key, from the header or the body."""
+    key = request.headers.get('Idempotency-Key') or (data or {}).get('idempotency_key')
+    if key is not None and not IDEMPOTENCY_KEY_PATTERN.match(key):
+        raise InvalidUsage('Invalid idempotency key')
+    return key
+
 # Route handlers
 @app.route('/')
 def index():
@@ -91,28 +2297,20 @@ def index():
 def pos():
     """Render the POS page with tables and menus data."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT t.*, 
-                   COUNT(CASE WHEN oi.status NOT IN ('completed', 'cancelled') THEN 1 END) as active_items
-            FROM tables t
-            LEFT JOIN order_items oi ON t.id = oi.table_id
-            GROUP BY t.id
-        """)
-        tables = cursor.fetchall()
-        
-        # Get menus
-        cursor.execute("SELECT id, name, price, category, description, is_available FROM menus")
-        menus = cursor.fetchall()
-        
-        # Get menu categories
-        cursor.execute("SELECT DISTINCT category FROM menus")
-        categories = [row['category'] for row in cursor.fetchall()]
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute("""
+                SELECT id, name, status, active_items, created_at
+                FROM tables
+                ORDER BY id
+            """)
+            tables = cursor.fetchall()
+            
+            cursor.close()
         
-        cursor.close()
-        close_db_connection(conn)
+        # Get menus and categories from the catalog cache
+        menus, categories, _, _ = menu_catalog.get()
         
         return render_template('pos.html', tables=tables, menus=menus, categories=categories)
     except Exception as e:
@@ -124,118 +2322,185 @@ def tickets():
     """Render the order tickets page."""
     return render_template('ticket.html')
 
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted asset, precompressed when the client accepts it.
+
+    The file name changes with the content, so responses may be cached
+    for a year without revalidation.
+    """
+    mimetype = mimetypes.guess_type(filename)[0]
+    accept = request.accept_encodings
+    for encoding, suffix in ASSET_ENCODINGS:
+        if accept[encoding] and os.path.isfile(os.path.join(asset_manifest.directory, filename + suffix)):
+            response = send_from_directory(asset_manifest.directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(asset_manifest.directory, filename, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
-    """Get all active order items grouped by table."""
+    """Get all active order items grouped by table.
+
+    ``station`` limits the feed to the items one prep station makes; the
+    sequence headers then refer to that station's room.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                oi.id,
-                oi.table_id,
-                oi.menu_id,
-                oi.quantity,
-                oi.unit_price,
-                oi.subtotal,
-                oi.status,
-                oi.notes,
-                oi.created_at,
-                m.name as menu_name,
-                m.category as menu_category,
-                t.name as table_name
-            FROM order_items oi
-            JOIN menus m ON oi.menu_id = m.id
-            JOIN tables t ON oi.table_id = t.id
-            WHERE oi.status IN ('pending', 'inprogress')
-            ORDER BY oi.created_at DESC
-        """)
-        
-        items = cursor.fetchall()
-        
-        # Convert decimal values to float for JSON serialization
-        for item in items:
-            item['unit_price'] = float(item['unit_price'])
-            item['subtotal'] = float(item['subtotal'])
-            item['created_at'] = item['created_at'].isoformat()
-        
-        # Group items by table
-        tables = {}
-        for item in items:
-            table_id = item['table_id']
-            if table_id not in tables:
-                tables[table_id] = {
-                    'table_id': table_id,
-                    'table_name': item['table_name'],
-                    'items': []
-                }
-            tables[table_id]['items'].append(item)
-        
-        return jsonify(list(tables.values()))
+        station = request.args.get('station') or None
+        if station is not None and station not in STATION_NAMES:
+            raise InvalidUsage(f'Unknown station. Must be one of: {", ".join(STATION_NAMES)}')
+        tables, room, seq, epoch = active_board.snapshot(station)
+        
+        if wants_compact():
+            response = items_response([item for table in tables for item in table['items']])
+        else:
+            response = json_response(tables)
+        response.headers['X-Event-Room'] = room
+        response.headers['X-Event-Seq'] = str(seq)
+        response.headers['X-Event-Epoch'] = epoch
+        return response
         
+    except InvalidUsage:
+        raise
     except Exception as e:
         app.logger.error(f"Error fetching orders: {str(e)}")
         raise InvalidUsage('Failed to fetch orders', status_code=500)
-    finally:
-        if 'conn' in locals():
-            close_db_connection(conn)
+
+@app.route('/api/orders/board/rebuild', methods=['POST'])
+def rebuild_order_board():
+    """Reload the in-memory active order board from the database."""
+    try:
+        count = active_board.rebuild()
+        return jsonify({'success': True, 'items': count})
+    except Exception as e:
+        app.logger.error(f"Error rebuilding order board: {str(e)}")
+        raise InvalidUsage('Failed to rebuild order board', status_code=500)
 
 @app.route('/api/orders', methods=['POST'])
 def create_order():
-    """Create new order items."""
+    """Create new order items.
+
+    With an ``Idempotency-Key`` header (or ``idempotency_key`` field) a
+    retried request returns the original item ids with ``replayed: true``
+    instead of creating the order again. Reusing the key for different
+    items is rejected with 422.
+    """
     try:
         data = request.get_json()
         items = data.get('items', [])
         
         if not items:
             raise InvalidUsage('No items provided')
+        key = request_idempotency_key(data)
             
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        created_items = []
-        for item in items:
-            # Validate each item
-            item_data = order_item_schema.load(item)
+        # Validate the whole batch in one pass
+        items = order_item_schema.load(items, many=True)
+        
+        with db_connection() as conn:
+            if key:
+                existing = claim_idempotency_key(conn, key, order_request_hash(items))
+                if existing is not None:
+                    return jsonify({'success': True, 'item_ids': existing, 'replayed': True})
             
-            # Get menu price to ensure price integrity
-            cursor.execute("SELECT price FROM menus WHERE id = %s", (item_data['menu_id'],))
-            menu = cursor.fetchone()
-            if not menu:
-                raise InvalidUsage(f"Menu item {item_data['menu_id']} not found")
+            created_items = insert_order_items(conn, items)
+            if key:
+                record_idempotency_key(conn, key, created_items)
             
-            cursor.execute("""
-                INSERT INTO order_items 
-                (table_id, menu_id, quantity, unit_price, notes)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                item_data['table_id'],
-                item_data['menu_id'],
-                item_data['quantity'],
-                menu[0],  # Use price from menu
-                item_data.get('notes')
-            ))
-            created_items.append(cursor.lastrowid)
-        
-        conn.commit()
-        close_db_connection(conn)
+            conn.commit()
+            payloads = fetch_order_items(conn, created_items)
         
         # Emit socket event
-        socketio.emit('new_orders', {'item_ids': created_items})
+        event_stream.emit('new_orders', {'item_ids': created_items, 'items': payloads})
         
         return jsonify({'success': True, 'item_ids': created_items})
         
     except ValidationError as ve:
         app.logger.error(f"Validation error: {str(ve)}")
         raise InvalidUsage(ve.messages, status_code=400)
+    except InvalidUsage:
+        raise
     except Exception as e:
         app.logger.error(f"Error creating order: {str(e)}")
-        if 'conn' in locals():
-            conn.rollback()
-            close_db_connection(conn)
         raise InvalidUsage('Failed to create order', status_code=500)
 
+@app.route('/api/orders/replay', methods=['POST'])
+def replay_orders():
+    """Apply a device's queued offline orders in one transaction.
+
+    Entries are ``{idempotency_key, items}`` and are applied in order. Each
+    gets an outcome: ``created`` with the new item ids, ``duplicate`` with
+    the ids created when the key was first seen, or ``rejected`` with the
+    reason, including a key first used for different items. A rejected entry is rolled back to its savepoint without
+    affecting the others.
+    """
+    try:
+        entries = (request.get_json() or {}).get('entries')
+        if not isinstance(entries, list) or not entries:
+            raise InvalidUsage('No entries provided')
+        if len(entries) > MAX_REPLAY_ENTRIES:
+            raise InvalidUsage(f'At most {MAX_REPLAY_ENTRIES} entries per replay')
+        
+        results = []
+        valid = []
+        for index, entry in enumerate(entries):
+            try:
+                valid.append((index, order_replay_entry_schema.load(entry)))
+            except ValidationError as ve:
+                results.append({
+                    'index': index,
+                    'idempotency_key': entry.get('idempotency_key') if isinstance(entry, dict) else None,
+                    'status': 'rejected',
+                    'message': ve.messages
+                })
+        
+        created_items = []
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            # Lock every affected table up front, in id order, so replays
+            # from several devices cannot deadlock on each other
+            lock_tables(cursor, {item['table_id'] for _, entry in valid for item in entry['items']})
+            
+            for index, entry in valid:
+                key = entry['idempotency_key']
+                result = {'index': index, 'idempotency_key': key}
+                cursor.execute("SAVEPOINT replay_entry")
+                try:
+                    existing = claim_idempotency_key(
+                        conn, key, order_request_hash(entry['items']))
+                    if existing is not None:
+                        result.update(status='duplicate', item_ids=existing)
+                    else:
+                        item_ids = insert_order_items(conn, entry['items'])
+                        record_idempotency_key(conn, key, item_ids)
+                        created_items.extend(item_ids)
+                        result.update(status='created', item_ids=item_ids)
+                    cursor.execute("RELEASE SAVEPOINT replay_entry")
+                except (InvalidUsage, mariadb.IntegrityError) as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT replay_entry")
+                    message = e.message if isinstance(e, InvalidUsage) else 'Unknown table or menu'
+                    result.update(status='rejected', message=message)
+                results.append(result)
+            
+            conn.commit()
+            cursor.close()
+            payloads = fetch_order_items(conn, created_items) if created_items else []
+        
+        if created_items:
+            event_stream.emit('new_orders', {'item_ids': created_items, 'items': payloads})
+        
+        results.sort(key=lambda result: result['index'])
+        return jsonify({'success': True, 'results': results, 'item_ids': created_items})
+        
+    except InvalidUsage:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error replaying orders: {str(e)}")
+        raise InvalidUsage('Failed to replay orders', status_code=500)
+
 @app.route('/api/orders/<int:item_id>/status', methods=['PUT'])
 def update_order_item_status(item_id):
     """Update the status of an order item."""
@@ -255,24 +2520,20 @@ def update_order_item_status(item_id):
         if new_status not in valid_statuses:
             raise InvalidUsage(f'Invalid status. Must be one of: {", ".join(valid_statuses)}')
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE order_items SET status = %s WHERE id = %s",
-            (new_status, item_id)
-        )
-        
-        if cursor.rowcount == 0:
-            raise InvalidUsage('Order item not found', status_code=404)
-        
-        conn.commit()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            previous, _ = set_order_items_status(conn, new_status, item_ids=[item_id])
+            
+            if not previous:
+                raise InvalidUsage('Order item not found', status_code=404)
+            
+            conn.commit()
+            payloads = fetch_order_items(conn, [item_id])
         
         # Emit socket event
-        socketio.emit('order_status_updated', {
+        event_stream.emit('order_status_updated', {
             'item_id': item_id,
-            'status': new_status
+            'status': new_status,
+            'items': payloads
         })
         
         return jsonify({'success': True})
@@ -281,32 +2542,90 @@ def update_order_item_status(item_id):
         raise
     except Exception as e:
         app.logger.error(f"Error updating order status: {str(e)}")
-        if 'conn' in locals():
-            conn.rollback()
-            close_db_connection(conn)
         raise InvalidUsage('Failed to update order status', status_code=500)
 
+@app.route('/api/orders/status', methods=['PUT'])
+def update_order_items_status():
+    """Move many order items to one status in a single transaction.
+
+    Targets either an explicit list of ``item_ids`` or every item of a
+    ``table_id`` (optionally only those currently in ``from_status``,
+    which defaults to the active statuses).
+    """
+    try:
+        data = order_status_batch_schema.load(request.get_json() or {})
+        new_status = data['status']
+        
+        with db_connection() as conn:
+            if 'item_ids' in data:
+                requested = list(dict.fromkeys(data['item_ids']))
+                current, changed = set_order_items_status(
+                    conn, new_status, item_ids=requested)
+            else:
+                current, changed = set_order_items_status(
+                    conn, new_status,
+                    table_id=data['table_id'],
+                    from_statuses=data.get('from_status') or list(ACTIVE_STATUSES)
+                )
+                requested = sorted(current)
+            
+            conn.commit()
+            payloads = fetch_order_items(conn, changed)
+        
+        results = []
+        for item_id in requested:
+            if item_id not in current:
+                outcome = 'not_found'
+            elif current[item_id] == new_status:
+                outcome = 'unchanged'
+            else:
+                outcome = 'updated'
+            results.append({
+                'item_id': item_id,
+                'result': outcome,
+                'previous_status': current.get(item_id)
+            })
+        
+        # Emit a single aggregated socket event
+        if changed:
+            event_stream.emit('order_status_updated', {
+                'item_ids': changed,
+                'status': new_status,
+                'table_id': data.get('table_id'),
+                'items': payloads
+            })
+        
+        return jsonify({
+            'success': True,
+            'status': new_status,
+            'updated': len(changed),
+            'results': results
+        })
+        
+    except ValidationError as ve:
+        raise InvalidUsage(ve.messages, status_code=400)
+    except InvalidUsage:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error updating order statuses: {str(e)}")
+        raise InvalidUsage('Failed to update order statuses', status_code=500)
+
 @app.route('/api/orders/<int:item_id>', methods=['DELETE'])
 def delete_order_item(item_id):
     """Delete an order item."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("UPDATE order_items SET status = 'cancelled' WHERE id = %s", (item_id,))
-        
-        conn.commit()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            set_order_items_status(conn, ORDER_STATUS['CANCELLED'], item_ids=[item_id])
+            
+            conn.commit()
+            payloads = fetch_order_items(conn, [item_id])
         
-        socketio.emit('order_item_deleted', {'item_id': item_id})
+        event_stream.emit('order_item_deleted', {'item_id': item_id, 'items': payloads})
         
         return jsonify({'success': True})
         
     except Exception as e:
         app.logger.error(f"Error deleting order item: {str(e)}")
-        if 'conn' in locals():
-            conn.rollback()
-            close_db_connection(conn)
         raise InvalidUsage('Failed to delete order item', status_code=500)
 
 # Additional route handlers
@@ -314,11 +2633,7 @@ def delete_order_item(item_id):
 def setup_menus():
     """Render the menu setup page."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT DISTINCT category FROM menus")
-        categories = [row['category'] for row in cursor.fetchall()]
-        close_db_connection(conn)
+        _, categories, _, _ = menu_catalog.get()
         return render_template('setup_menu.html', categories=categories)
     except Exception as e:
         app.logger.error(f"Error fetching menu categories: {str(e)}")
@@ -331,18 +2646,13 @@ def setup_tables():
 
 @app.route('/api/menus', methods=['GET'])
 def get_menus():
-    """Get all menus."""
+    """Get all menus, answering 304 when the client's ETag is current."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, name, price, category, description, is_available 
-            FROM menus 
-            ORDER BY category, name
-        """)
-        menus = cursor.fetchall()
-        close_db_connection(conn)
-        return jsonify(menus)
+        _, _, body, etag = menu_catalog.get()
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         app.logger.error(f"Error fetching menus: {str(e)}")
         raise InvalidUsage('Failed to fetch menus', status_code=500)
@@ -351,18 +2661,14 @@ def get_menus():
 def get_tables():
     """Get all tables with their current status."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT t.*, 
-                   COUNT(CASE WHEN oi.status NOT IN ('completed', 'cancelled') THEN 1 END) as active_items
-            FROM tables t
-            LEFT JOIN order_items oi ON t.id = oi.table_id
-            GROUP BY t.id
-            ORDER BY t.name
-        """)
-        tables = cursor.fetchall()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, name, status, active_items, created_at
+                FROM tables
+                ORDER BY name
+            """)
+            tables = cursor.fetchall()
         return jsonify(tables)
     except Exception as e:
         app.logger.error(f"Error fetching tables: {str(e)}")
@@ -370,98 +2676,115 @@ def get_tables():
 
 @app.route('/api/menus', methods=['PUT'])
 def update_menus():
-    """Update menu items."""
+    """Save the menu list, writing only the menus that changed.
+
+    Menus without an id are created. Returns the created and updated
+    menus, and broadcasts them in ``menu_updated`` with the new catalog
+    version; a save without changes bumps nothing.
+    """
     try:
         data = request.get_json()
         if not isinstance(data, list):
             raise InvalidUsage('Invalid input: expected array of menu items')
-            
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        menus = menu_update_schema.load(data)
         
-        for menu in data:
-            if menu.get('id'):
-                cursor.execute("""
-                    UPDATE menus 
-                    SET name = %s, price = %s, category = %s, 
-                        description = %s, is_available = %s
-                    WHERE id = %s
-                """, (
-                    menu['name'], menu['price'], menu['category'],
-                    menu.get('description'), menu.get('is_available', True),
-                    menu['id']
-                ))
-            else:
-                cursor.execute("""
-                    INSERT INTO menus (name, price, category, description, is_available)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    menu['name'], menu['price'], menu['category'],
-                    menu.get('description'), menu.get('is_available', True)
-                ))
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            created, updated, unchanged, missing = apply_row_diff(cursor, 'menus', MENU_COLUMNS, menus)
+            cursor.close()
+            rows = fetch_rows(conn, 'menus', MENU_COLUMNS, created + updated)
+            conn.commit()
         
-        conn.commit()
-        close_db_connection(conn)
-        return jsonify({'success': True})
+        for menu in rows.values():
+            menu['price'] = float(menu['price'])
+            menu['is_available'] = bool(menu['is_available'])
+        created = [rows[menu_id] for menu_id in created]
+        updated = [rows[menu_id] for menu_id in updated]
+        
+        if created or updated:
+            version = menu_catalog.bump()
+            active_board.rename(menus={
+                menu['id']: (menu['name'], menu['category']) for menu in updated
+            })
+            event_stream.emit('menu_updated', {'version': version, 'menus': created + updated})
+        else:
+            version = menu_catalog.version
+        
+        return jsonify({
+            'success': True,
+            'version': version,
+            'created': created,
+            'updated': updated,
+            'unchanged': unchanged,
+            'missing': missing
+        })
         
+    except ValidationError as ve:
+        raise InvalidUsage(ve.messages, status_code=400)
+    except InvalidUsage:
+        raise
     except Exception as e:
         app.logger.error(f"Error updating menus: {str(e)}")
-        if 'conn' in locals():
-            conn.rollback()
-            close_db_connection(conn)
         raise InvalidUsage('Failed to update menus', status_code=500)
 
 @app.route('/api/tables', methods=['PUT'])
 def update_tables():
-    """Update tables."""
+    """Save the table list, writing only the tables that changed.
+
+    Tables without an id are created. Returns the created and updated
+    tables and broadcasts them in ``table_updated``.
+    """
     try:
         data = request.get_json()
         if not isinstance(data, list):
             raise InvalidUsage('Invalid input: expected array of tables')
-            
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        tables = table_update_schema.load(data)
         
-        for table in data:
-            if table.get('id'):
-                cursor.execute("""
-                    UPDATE tables 
-                    SET name = %s
-                    WHERE id = %s
-                """, (table['name'], table['id']))
-            else:
-                cursor.execute("""
-                    INSERT INTO tables (name)
-                    VALUES (%s)
-                """, (table['name'],))
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            created, updated, unchanged, missing = apply_row_diff(cursor, 'tables', TABLE_COLUMNS, tables)
+            cursor.close()
+            rows = fetch_rows(conn, 'tables', ('name', 'status', 'active_items'), created + updated)
+            conn.commit()
         
-        conn.commit()
-        close_db_connection(conn)
-        return jsonify({'success': True})
+        created = [rows[table_id] for table_id in created]
+        updated = [rows[table_id] for table_id in updated]
+        
+        if created or updated:
+            active_board.rename(tables={table['id']: table['name'] for table in updated})
+            event_stream.emit('table_updated', {'tables': created + updated})
         
+        return jsonify({
+            'success': True,
+            'created': created,
+            'updated': updated,
+            'unchanged': unchanged,
+            'missing': missing
+        })
+        
+    except ValidationError as ve:
+        raise InvalidUsage(ve.messages, status_code=400)
+    except InvalidUsage:
+        raise
     except Exception as e:
         app.logger.error(f"Error updating tables: {str(e)}")
-        if 'conn' in locals():
-            conn.rollback()
-            close_db_connection(conn)
         raise InvalidUsage('Failed to update tables', status_code=500)
 
 @app.route('/api/stats/tables', methods=['GET'])
 def get_tables_stats():
     """Get tables statistics."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(CASE WHEN status = 'occupied' THEN 1 END) as active
-            FROM tables
-        """)
-        
-        stats = cursor.fetchone()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total,
+                    COUNT(CASE WHEN status = 'occupied' THEN 1 END) as active
+                FROM tables
+            """)
+            
+            stats = cursor.fetchone()
         
         return jsonify(stats)
         
@@ -473,24 +2796,24 @@ def get_tables_stats():
 def get_orders_stats():
     """Get orders statistics."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                COUNT(CASE WHEN status = %s THEN 1 END) as pending,
-                COUNT(CASE WHEN status = %s THEN 1 END) as in_progress,
-                COUNT(CASE WHEN status = %s THEN 1 END) as completed
-            FROM order_items
-            WHERE DATE(created_at) = CURDATE()
-        """, (
-            ORDER_STATUS['PENDING'],
-            ORDER_STATUS['IN_PROGRESS'],
-            ORDER_STATUS['COMPLETED']
-        ))
-        
-        stats = cursor.fetchone()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute("""
+                SELECT 
+                    COUNT(CASE WHEN status = %s THEN 1 END) as pending,
+                    COUNT(CASE WHEN status = %s THEN 1 END) as in_progress,
+                    COUNT(CASE WHEN status = %s THEN 1 END) as completed
+                FROM order_items
+                WHERE created_at >= %s AND created_at < %s
+            """, (
+                ORDER_STATUS['PENDING'],
+                ORDER_STATUS['IN_PROGRESS'],
+                ORDER_STATUS['COMPLETED'],
+                *business_day_range()
+            ))
+            
+            stats = cursor.fetchone()
         
         return jsonify(stats)
         
@@ -503,27 +2826,26 @@ def get_orders_stats():
 def get_today_sales():
     """Get today's sales statistics."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                COALESCE(SUM(subtotal), 0) as total,
-                COUNT(DISTINCT table_id) as tables_served,
-                COUNT(*) as total_orders
-            FROM order_items
-            WHERE DATE(created_at) = CURDATE()
-            AND status = %s
-        """, (ORDER_STATUS['COMPLETED'],))
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute("""
+                SELECT 
+                    COALESCE(SUM(subtotal), 0) as total,
+                    COUNT(DISTINCT table_id) as tables_served,
+                    COUNT(*) as total_orders
+                FROM order_items
+                WHERE created_at >= %s AND created_at < %s
+                AND status = %s
+            """, (*business_day_range(), ORDER_STATUS['COMPLETED']))
+            
+            stats = cursor.fetchone()
         
-        stats = cursor.fetchone()
         if stats['total'] is None:
             stats['total'] = 0
             
         # Convert Decimal to float for JSON serialization
         stats['total'] = float(stats['total'])
-            
-        close_db_connection(conn)
         
         return jsonify(stats)
         
@@ -531,6 +2853,225 @@ def get_today_sales():
         app.logger.error(f"Error fetching sales stats: {str(e)}")
         raise InvalidUsage('Failed to fetch sales stats', status_code=500)
 
+def load_stats_summary():
+    """Compute every dashboard figure for the current business day in one query."""
+    start, end = business_day_range()
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT 
+                (SELECT COUNT(*) FROM tables) as tables_total,
+                (SELECT COUNT(*) FROM tables WHERE status = 'occupied') as tables_active,
+                COUNT(CASE WHEN status = %s THEN 1 END) as pending,
+                COUNT(CASE WHEN status = %s THEN 1 END) as in_progress,
+                COUNT(CASE WHEN status = %s THEN 1 END) as completed,
+                COUNT(CASE WHEN status = %s THEN 1 END) as cancelled,
+                COALESCE(SUM(CASE WHEN status = %s THEN subtotal END), 0) as sales_total,
+                COUNT(DISTINCT CASE WHEN status = %s THEN table_id END) as tables_served
+            FROM order_items
+            WHERE created_at >= %s AND created_at < %s
+        """, (
+            ORDER_STATUS['PENDING'],
+            ORDER_STATUS['IN_PROGRESS'],
+            ORDER_STATUS['COMPLETED'],
+            ORDER_STATUS['CANCELLED'],
+            ORDER_STATUS['COMPLETED'],
+            ORDER_STATUS['COMPLETED'],
+            start,
+            end
+        ))
+        row = cursor.fetchone()
+    
+    return {
+        'tables': {
+            'total': row['tables_total'],
+            'active': row['tables_active']
+        },
+        'orders': {
+            'pending': row['pending'],
+            'in_progress': row['in_progress'],
+            'completed': row['completed'],
+            'cancelled': row['cancelled']
+        },
+        'sales': {
+            'total': float(row['sales_total']),
+            'tables_served': row['tables_served'],
+            'total_orders': row['completed']
+        },
+        'business_day': {
+            'start': start.isoformat(),
+            'end': end.isoformat()
+        },
+        'generated_at': datetime.now().isoformat()
+    }
+
+stats_summary_cache = CachedValue(load_stats_summary, STATS_CACHE_TTL)
+# Any broadcast change makes the next dashboard read recompute
+event_stream.subscribe(stats_summary_cache.invalidate)
+
+@app.route('/api/stats/summary', methods=['GET'])
+def get_stats_summary():
+    """Get all dashboard statistics in one response."""
+    try:
+        return jsonify(stats_summary_cache.get())
+    except Exception as e:
+        app.logger.error(f"Error fetching stats summary: {str(e)}")
+        raise InvalidUsage('Failed to fetch stats summary', status_code=500)
+
+@app.route('/api/stats/events', methods=['GET'])
+def get_event_stats():
+    """Get socket event coalescing counters."""
+    return jsonify(event_stream.stats())
+
+@app.route('/api/stats/db', methods=['GET'])
+def get_db_stats():
+    """Get database connection pool and blocking executor statistics."""
+    return jsonify(dict(db_pool.stats(), executor=db_executor.stats()))
+
+SALES_REPORT_GROUPS = {
+    'hour': ('r.bucket_hour', 'r.bucket_hour AS period', 'r.bucket_hour'),
+    'day': (
+        f'DATE(r.bucket_hour - INTERVAL {BUSINESS_DAY_CUTOFF_HOUR} HOUR)',
+        f'DATE(r.bucket_hour - INTERVAL {BUSINESS_DAY_CUTOFF_HOUR} HOUR) AS period',
+        'period'
+    ),
+    'category': ('m.category', 'm.category', 'completed_sales DESC'),
+    'item': ('r.menu_id, m.name, m.category', 'r.menu_id, m.name, m.category', 'completed_sales DESC')
+}
+
+def parse_report_bound(value, name, end=False):
+    """Parse a report ``from``/``to`` bound.
+
+    A date means the business day starting on it; as an end bound it is
+    inclusive, so ``to=2024-05-31`` covers that whole day. A datetime is
+    used as given.
+    """
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, '%Y-%m-%d') + timedelta(hours=BUSINESS_DAY_CUTOFF_HOUR)
+            return day + timedelta(days=1) if end else day
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidUsage(f'Invalid {name}. Use YYYY-MM-DD or an ISO datetime')
+
+def sales_report_figures(row):
+    """Pop the summed rollup columns off ``row`` as report figures."""
+    # SUM() over INT columns comes back as Decimal
+    completed = int(row.pop('completed_items') or 0)
+    sales = float(row.pop('completed_sales') or 0)
+    row.update({
+        'total_orders': completed,
+        'quantity': int(row.pop('completed_quantity') or 0),
+        'total_sales': sales,
+        'average_order_value': round(sales / completed, 2) if completed else None,
+        'cancelled_orders': int(row.pop('cancelled_items') or 0),
+        'cancelled_quantity': int(row.pop('cancelled_quantity') or 0),
+        'cancelled_sales': float(row.pop('cancelled_sales') or 0)
+    })
+    return row
+
+@app.route('/api/reports/sales', methods=['GET'])
+def get_sales_report():
+    """Sales totals over a date range, read only from the hourly rollups.
+
+    ``group_by`` is ``hour``, ``day`` (business day), ``category`` or
+    ``item``. The range defaults to the last seven business days and
+    covers the hour buckets starting in ``[from, to)``; ``table_id``
+    restricts it to one table.
+    """
+    try:
+        group_by = request.args.get('group_by', 'day')
+        if group_by not in SALES_REPORT_GROUPS:
+            raise InvalidUsage(f'Invalid group_by. Must be one of: {", ".join(SALES_REPORT_GROUPS)}')
+        end = request.args.get('to')
+        end = parse_report_bound(end, 'to', end=True) if end else business_day_range()[1]
+        start = request.args.get('from')
+        start = parse_report_bound(start, 'from') if start else end - timedelta(days=7)
+        if start >= end:
+            raise InvalidUsage('from must be before to')
+        
+        conditions = ['r.bucket_hour >= %s', 'r.bucket_hour < %s']
+        params = [start, end]
+        table_id = request.args.get('table_id', type=int)
+        if table_id is not None:
+            conditions.append('r.table_id = %s')
+            params.append(table_id)
+        
+        group, select, order = SALES_REPORT_GROUPS[group_by]
+        sums = ', '.join(f'SUM(r.{column}) AS {column}' for column in SALES_ROLLUP_COLUMNS)
+        join = 'JOIN menus m ON m.id = r.menu_id' if group_by in ('category', 'item') else ''
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT {select}, {sums}
+                FROM sales_rollup_hourly r
+                {join}
+                WHERE {' AND '.join(conditions)}
+                GROUP BY {group}
+                ORDER BY {order}
+            """, tuple(params))
+            rows = cursor.fetchall()
+        
+        totals = dict.fromkeys(SALES_ROLLUP_COLUMNS, 0)
+        for row in rows:
+            for column in SALES_ROLLUP_COLUMNS:
+                totals[column] += row[column] or 0
+            sales_report_figures(row)
+            if 'period' in row:
+                row['period'] = row['period'].isoformat()
+        
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'group_by': group_by,
+            'rows': rows,
+            'totals': sales_report_figures(totals)
+        })
+        
+    except InvalidUsage:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching sales report: {str(e)}")
+        raise InvalidUsage('Failed to fetch sales report', status_code=500)
+
+@app.route('/api/orders/export', methods=['GET'])
+def export_orders():
+    """Stream order history as CSV or NDJSON.
+
+    ``from`` is required; ``from``/``to`` take the same bounds as the
+    sales report. ``format`` is ``csv`` (default) or ``ndjson``, ``status``
+    a comma-separated filter and ``gzip=1`` sends a gzipped file.
+    """
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            raise InvalidUsage(f'Invalid format. Must be one of: {", ".join(EXPORT_FORMATS)}')
+        if not request.args.get('from'):
+            raise InvalidUsage('from is required')
+        start = parse_report_bound(request.args['from'], 'from')
+        end = request.args.get('to')
+        end = parse_report_bound(end, 'to', end=True) if end else business_day_range()[1]
+        if start >= end:
+            raise InvalidUsage('from must be before to')
+        statuses = [status for status in request.args.get('status', '').split(',') if status]
+        invalid = [status for status in statuses if status not in ORDER_STATUS.values()]
+        if invalid:
+            raise InvalidUsage(f'Invalid status. Must be one of: {", ".join(ORDER_STATUS.values())}')
+        compress = request.args.get('gzip') in ('1', 'true')
+        
+        chunks = export_order_items(start, end, fmt, statuses, compress)
+        last_day = business_day_range(end - timedelta(seconds=1))[0]
+        filename = f'orders-{start:%Y%m%d}-{last_day:%Y%m%d}.{fmt}' + ('.gz' if compress else '')
+        response = Response(chunks, mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+        
+    except InvalidUsage:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error exporting orders: {str(e)}")
+        raise InvalidUsage('Failed to export orders', status_code=500)
+
 @app.route('/api/orders/<int:item_id>/notes', methods=['PUT'])
 def update_order_notes(item_id):
     """Update the notes of an order item."""
@@ -538,247 +3079,506 @@ def update_order_notes(item_id):
         data = request.get_json()
         notes = data.get('notes', '')
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE order_items SET notes = %s WHERE id = %s",
-            (notes, item_id)
-        )
-        
-        if cursor.rowcount == 0:
-            raise InvalidUsage('Order item not found', status_code=404)
-        
-        conn.commit()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE order_items SET notes = %s WHERE id = %s",
+                (notes, item_id)
+            )
+            
+            if cursor.rowcount == 0:
+                raise InvalidUsage('Order item not found', status_code=404)
+            
+            conn.commit()
+            payloads = fetch_order_items(conn, [item_id])
         
         # Emit socket event
-        socketio.emit('order_notes_updated', {
+        event_stream.emit('order_notes_updated', {
             'item_id': item_id,
-            'notes': notes
+            'notes': notes,
+            'items': payloads
         })
         
         return jsonify({'success': True})
         
+    except InvalidUsage:
+        raise
     except Exception as e:
         app.logger.error(f"Error updating order notes: {str(e)}")
-        if 'conn' in locals():
-            conn.rollback()
-            close_db_connection(conn)
         raise InvalidUsage('Failed to update order notes', status_code=500)
 
 @app.route('/api/orders/completed', methods=['GET'])
 def get_completed_orders():
-    """Get completed orders with pagination."""
+    """Get completed orders, newest first.
+
+    Passing ``cursor`` (empty for the first page) selects keyset pagination
+    on ``(created_at, id)``, which costs the same at any depth and returns
+    an opaque ``next_cursor``. Without it the legacy ``page``/``per_page``
+    offset pagination is used. ``count`` picks how ``total`` is computed:
+    ``exact``, ``estimate`` (optimizer row estimate) or ``none``; it
+    defaults to ``exact`` for page mode and ``none`` for cursor mode.
+    """
     try:
-        page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        keyset = 'cursor' in request.args
+        page = None if keyset else int(request.args.get('page', 1))
+        count_mode = request.args.get('count', 'none' if keyset else 'exact')
         
-        if page < 1 or per_page < 1:
+        if per_page < 1 or (page is not None and page < 1):
             raise InvalidUsage('Invalid pagination parameters')
+        if count_mode not in ('exact', 'estimate', 'none'):
+            raise InvalidUsage('Invalid count mode. Must be one of: exact, estimate, none')
         
-        offset = (page - 1) * per_page
+        after = decode_cursor(request.args['cursor']) if keyset and request.args['cursor'] else None
+        station_sql, station_params, menus_join = '', [], ''
+        if request.args.get('station'):
+            station_sql, station_params = station_category_condition(request.args['station'])
+            menus_join = 'JOIN menus m ON oi.menu_id = m.id'
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get total count
-        cursor.execute("""
-            SELECT COUNT(DISTINCT oi.id) as total
-            FROM order_items oi
-            WHERE oi.status = 'completed'
-        """)
-        total = cursor.fetchone()['total']
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            # Get total count
+            total = None
+            if count_mode != 'none':
+                total = 0
+                for source in ('order_items', 'order_items_archive'):
+                    count_sql = f"""
+                        SELECT COUNT(*) as total
+                        FROM {source} oi
+                        {menus_join}
+                        WHERE oi.status = 'completed' {station_sql}
+                    """
+                    if count_mode == 'exact':
+                        cursor.execute(count_sql, tuple(station_params))
+                        total += cursor.fetchone()['total']
+                    else:
+                        # With the station join the plan has a menus row
+                        # too, which may come first
+                        cursor.execute('EXPLAIN ' + count_sql, tuple(station_params))
+                        plan = cursor.fetchall()
+                        row = next((row for row in plan if row['table'] == 'oi'), plan[0])
+                        total += int(row['rows'] or 0)
+            
+            # Each side of the hot/archive union is limited before merging,
+            # and one extra row tells whether another page exists
+            conditions = station_sql
+            params = list(station_params)
+            if keyset and after:
+                conditions += ' AND (oi.created_at < %s OR (oi.created_at = %s AND oi.id < %s))'
+                params += [after[0], after[0], after[1]]
+            offset = 0 if keyset else (page - 1) * per_page
+            side_limit = offset + per_page + 1
+            cursor.execute(f"""
+                SELECT * FROM (
+                    ({ORDER_ITEM_SELECT}
+                     WHERE oi.status = 'completed' {conditions}
+                     ORDER BY oi.created_at DESC, oi.id DESC
+                     LIMIT %s)
+                    UNION ALL
+                    ({ARCHIVED_ITEM_SELECT}
+                     WHERE oi.status = 'completed' {conditions}
+                     ORDER BY oi.created_at DESC, oi.id DESC
+                     LIMIT %s)
+                ) history
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s OFFSET %s
+            """, (*params, side_limit, *params, side_limit, per_page + 1, offset))
+            
+            items = cursor.fetchall()
         
-        # Get paginated completed orders
-        cursor.execute("""
-            SELECT 
-                oi.id,
-                oi.table_id,
-                oi.menu_id,
-                oi.quantity,
-                oi.unit_price,
-                oi.subtotal,
-                oi.status,
-                oi.notes,
-                oi.created_at,
-                m.name as menu_name,
-                m.category as menu_category,
-                t.name as table_name
-            FROM order_items oi
-            JOIN menus m ON oi.menu_id = m.id
-            JOIN tables t ON oi.table_id = t.id
-            WHERE oi.status = 'completed'
-            ORDER BY oi.created_at DESC
-            LIMIT %s OFFSET %s
-        """, (per_page, offset))
-        
-        items = cursor.fetchall()
-        close_db_connection(conn)
+        has_more = len(items) > per_page
+        items = items[:per_page]
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(items[-1]['created_at'], items[-1]['id'])
         
-        # Group items by table
-        tables = {}
         for item in items:
-            table_id = item['table_id']
-            if table_id not in tables:
-                tables[table_id] = {
-                    'table_id': table_id,
-                    'table_name': item['table_name'],
-                    'items': []
-                }
-            tables[table_id]['items'].append({
-                'id': item['id'],
-                'menu_id': item['menu_id'],
-                'menu_name': item['menu_name'],
-                'menu_category': item['menu_category'],
-                'quantity': item['quantity'],
-                'unit_price': float(item['unit_price']),
-                'subtotal': float(item['subtotal']),
-                'status': item['status'],
-                'notes': item['notes'],
-                'created_at': item['created_at'].isoformat()
-            })
-        
-        return jsonify({
-            'orders': list(tables.values()),
-            'total': total,
-            'page': page,
+            serialize_order_item(item)
+        
+        if wants_compact():
+            orders = compact_items(items)
+        else:
+            # Group items by table
+            tables = {}
+            for item in items:
+                table_id = item['table_id']
+                if table_id not in tables:
+                    tables[table_id] = {
+                        'table_id': table_id,
+                        'table_name': item['table_name'],
+                        'items': []
+                    }
+                tables[table_id]['items'].append(item)
+            orders = list(tables.values())
+        
+        result = {
+            'orders': orders,
             'per_page': per_page,
-            'total_pages': (total + per_page - 1) // per_page
-        })
+            'next_cursor': next_cursor
+        }
+        if total is not None:
+            result['total'] = total
+            result['total_is_estimate'] = count_mode == 'estimate'
+        if not keyset:
+            result['page'] = page
+            if total is not None:
+                result['total_pages'] = (total + per_page - 1) // per_page
+        
+        return json_response(result)
         
     except ValueError:
         raise InvalidUsage('Invalid pagination parameters')
+    except InvalidUsage:
+        raise
     except Exception as e:
         app.logger.error(f"Error fetching completed orders: {str(e)}")
         raise InvalidUsage('Failed to fetch completed orders', status_code=500)
 
+@app.route('/api/orders/changes', methods=['GET'])
+def get_order_changes():
+    """Get order items created or changed since a cursor.
+
+    Items are ordered by ``(updated_at, id)`` on ``idx_orderitem_updated``
+    and each response carries the ``cursor`` to resume from. Without
+    ``since`` only the current position is returned; an empty ``since``
+    starts from the oldest item. The feed trails the clock by
+    ``CHANGE_FEED_LAG`` seconds because ``updated_at`` has one-second
+    resolution and is stamped before the writing transaction commits.
+    Deleted items do not appear.
+    """
+    try:
+        limit = min(max(request.args.get('limit', 200, type=int), 1), 1000)
+        table_id = request.args.get('table_id', type=int)
+        since = request.args.get('since')
+        after = decode_cursor(since) if since else None
+        
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT NOW() - INTERVAL %s SECOND AS horizon", (CHANGE_FEED_LAG,))
+            horizon = cursor.fetchone()['horizon'].replace(microsecond=0)
+            
+            if since is None:
+                cursor.close()
+                return jsonify({'changes': [], 'cursor': encode_cursor(horizon, 0), 'has_more': False})
+            
+            conditions = ["oi.updated_at <= %s"]
+            params = [horizon]
+            if after:
+                conditions.append("oi.updated_at >= %s AND (oi.updated_at > %s OR oi.id > %s)")
+                params.extend((after[0], after[0], after[1]))
+            if table_id is not None:
+                conditions.append("oi.table_id = %s")
+                params.append(table_id)
+            cursor.execute(f"""
+                {ORDER_ITEM_SELECT}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY oi.updated_at, oi.id
+                LIMIT %s
+            """, (*params, limit + 1))
+            items = cursor.fetchall()
+            cursor.close()
+        
+        has_more = len(items) > limit
+        items = items[:limit]
+        if items:
+            next_cursor = encode_cursor(items[-1]['updated_at'], items[-1]['id'])
+        else:
+            next_cursor = since
+        
+        return jsonify({
+            'changes': [serialize_order_item(item) for item in items],
+            'cursor': next_cursor,
+            'has_more': has_more
+        })
+        
+    except InvalidUsage:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching order changes: {str(e)}")
+        raise InvalidUsage('Failed to fetch order changes', status_code=500)
+
 @app.route('/api/orders/complete', methods=['POST'])
 def complete_order():
-    """Complete all orders for a table."""
+    """Complete all orders for a table and close its check."""
     try:
         table_id = request.get_json().get('table_id')
         if not table_id:
             raise InvalidUsage('Table ID is required')
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Update all active orders to completed
-        cursor.execute("""
-            UPDATE order_items 
-            SET status = 'completed'
-            WHERE table_id = %s 
-            AND status NOT IN ('completed', 'cancelled')
-        """, (table_id,))
-        
-        conn.commit()
-        close_db_connection(conn)
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            check_id = close_table_check(cursor, table_id)
+            cursor.close()
+            
+            # Update all active orders to completed
+            _, item_ids = set_order_items_status(
+                conn, ORDER_STATUS['COMPLETED'],
+                table_id=table_id,
+                from_statuses=list(ACTIVE_STATUSES)
+            )
+            
+            conn.commit()
+            payloads = fetch_order_items(conn, item_ids)
         
         # Emit socket events
-        socketio.emit('order_completed', {'table_id': table_id})
-        socketio.emit('table_updated', {'table_id': table_id})
+        event_stream.emit('order_completed', {
+            'table_id': table_id,
+            'check_id': check_id,
+            'item_ids': item_ids,
+            'items': payloads
+        })
+        event_stream.emit('table_updated', {'table_id': table_id})
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'check_id': check_id})
         
     except Exception as e:
         app.logger.error(f"Error completing orders: {str(e)}")
         raise InvalidUsage('Failed to complete orders')
 
+@app.route('/api/tables/<int:table_id>/check', methods=['GET'])
+def get_table_check(table_id):
+    """Get the table's open check and its items, newest first."""
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT c.id, c.table_id, c.status, c.opened_at, c.closed_at
+                FROM tables t
+                JOIN table_checks c ON c.id = t.current_check_id
+                WHERE t.id = %s
+            """, (table_id,))
+            check = cursor.fetchone()
+            items = []
+            if check:
+                cursor.execute(f"""
+                    {ORDER_ITEM_SELECT}
+                    WHERE oi.check_id = %s
+                    ORDER BY oi.created_at DESC, oi.id DESC
+                """, (check['id'],))
+                items = cursor.fetchall()
+            cursor.close()
+        
+        check = serialize_check(check) if check else None
+        items = [serialize_order_item(item) for item in items]
+        if wants_compact():
+            return items_response(items, check=check)
+        return json_response({'check': check, 'items': items})
+        
+    except Exception as e:
+        app.logger.error(f"Error fetching table check: {str(e)}")
+        raise InvalidUsage('Failed to fetch table check', status_code=500)
+
+@app.route('/api/tables/<int:table_id>/checks', methods=['GET'])
+def get_table_checks(table_id):
+    """Get the table's closed checks with their items, newest first.
+
+    Keyset paginated: pass the returned ``next_cursor`` as ``cursor``.
+    """
+    try:
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        token = request.args.get('cursor')
+        before = decode_cursor(token)[1] if token else None
+        
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT id, table_id, status, opened_at, closed_at
+                FROM table_checks
+                WHERE table_id = %s AND status = 'closed'
+                {'AND id < %s' if before else ''}
+                ORDER BY id DESC
+                LIMIT %s
+            """, (table_id, *((before,) if before else ()), limit + 1))
+            checks = cursor.fetchall()
+            next_cursor = None
+            if len(checks) > limit:
+                checks = checks[:limit]
+                next_cursor = encode_cursor(checks[-1]['opened_at'], checks[-1]['id'])
+            
+            items = []
+            if checks:
+                placeholders = ', '.join(['%s'] * len(checks))
+                check_ids = tuple(check['id'] for check in checks)
+                cursor.execute(f"""
+                    SELECT * FROM (
+                        {ORDER_ITEM_SELECT} WHERE oi.check_id IN ({placeholders})
+                        UNION ALL
+                        {ARCHIVED_ITEM_SELECT} WHERE oi.check_id IN ({placeholders})
+                    ) history
+                    ORDER BY created_at DESC, id DESC
+                """, check_ids + check_ids)
+                items = cursor.fetchall()
+            cursor.close()
+        
+        by_check = {check['id']: dict(serialize_check(check), items=[], total=0.0) for check in checks}
+        for item in items:
+            check = by_check[item['check_id']]
+            check['items'].append(serialize_order_item(item))
+            if item['status'] != ORDER_STATUS['CANCELLED']:
+                check['total'] = round(check['total'] + item['subtotal'], 2)
+        
+        return jsonify({'checks': list(by_check.values()), 'next_cursor': next_cursor})
+        
+    except InvalidUsage:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching table checks: {str(e)}")
+        raise InvalidUsage('Failed to fetch table checks', status_code=500)
+
 @app.route('/api/tables/<int:table_id>/orders', methods=['GET'])
 def get_table_orders(table_id):
-    """Get all orders for a specific table, including completed ones."""
+    """Get all orders ever placed at a table, including completed ones.
+
+    Grows with the table's lifetime; the POS reads the open check from
+    ``/api/tables/<id>/check`` instead.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute(f"""
+                SELECT * FROM (
+                    {ORDER_ITEM_SELECT} WHERE oi.table_id = %s
+                    UNION ALL
+                    {ARCHIVED_ITEM_SELECT} WHERE oi.table_id = %s
+                ) history
+                ORDER BY created_at DESC, id DESC
+            """, (table_id, table_id))
+            
+            items = cursor.fetchall()
         
-        cursor.execute("""
-            SELECT 
-                oi.id,
-                oi.menu_id,
-                m.name as menu_name,
-                m.category as menu_category,
-                oi.quantity,
-                oi.unit_price,
-                oi.subtotal,
-                oi.status,
-                oi.notes,
-                oi.created_at
-            FROM order_items oi
-            JOIN menus m ON oi.menu_id = m.id
-            WHERE oi.table_id = %s
-            ORDER BY oi.created_at DESC
-        """, (table_id,))
-        
-        items = cursor.fetchall()
-        
-        # Convert decimal values to float for JSON serialization
         for item in items:
-            item['unit_price'] = float(item['unit_price'])
-            item['subtotal'] = float(item['subtotal'])
-            item['created_at'] = item['created_at'].isoformat()
+            serialize_order_item(item)
         
-        return jsonify(items)
+        if wants_compact():
+            return items_response(items)
+        return json_response(items)
         
     except Exception as e:
         app.logger.error(f"Error fetching table orders: {str(e)}")
         raise InvalidUsage('Failed to fetch table orders', status_code=500)
-    finally:
-        if 'conn' in locals():
-            close_db_connection(conn)
 
 @app.route('/api/orders/<int:item_id>/cancel', methods=['PUT'])
 def cancel_order_item(item_id):
     """Cancel a specific order item."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Start transaction
-        conn.start_transaction()
-        
-        try:
-            # Update the order item status to cancelled
-            cursor.execute("""
-                UPDATE order_items 
-                SET status = %s,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s 
-                AND status NOT IN (%s, %s)
-            """, (
-                ORDER_STATUS['CANCELLED'],
-                item_id,
-                ORDER_STATUS['COMPLETED'],
-                ORDER_STATUS['CANCELLED']
-            ))
+        with db_connection() as conn:
+            # Update the order item status to cancelled; an uncommitted
+            # transaction is rolled back when the connection is returned
+            _, changed = set_order_items_status(
+                conn, ORDER_STATUS['CANCELLED'],
+                item_ids=[item_id],
+                from_statuses=list(ACTIVE_STATUSES)
+            )
             
-            if cursor.rowcount == 0:
+            if not changed:
                 raise InvalidUsage('Order item not found or already completed/cancelled', status_code=404)
             
             conn.commit()
-            
-            # Emit socket event
-            socketio.emit('order_updated', {'item_id': item_id, 'status': ORDER_STATUS['CANCELLED']})
-            
-            return jsonify({
-                'success': True,
-                'message': 'Order item cancelled successfully'
-            })
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
+            payloads = fetch_order_items(conn, [item_id])
+        
+        # Emit socket event
+        event_stream.emit('order_updated', {
+            'item_id': item_id,
+            'status': ORDER_STATUS['CANCELLED'],
+            'items': payloads
+        })
+        
+        return jsonify({
+            'success': True,
+            'message': 'Order item cancelled successfully'
+        })
             
     except InvalidUsage as iu:
         raise iu
     except Exception as e:
         app.logger.error(f"Error cancelling order item: {str(e)}")
         raise InvalidUsage('Failed to cancel order item', status_code=500)
-    finally:
-        if 'conn' in locals():
-            close_db_connection(conn)
 
 # Error handlers
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe latency and database time for the finished request."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, request.method)
+        REQUESTS_TOTAL.inc(endpoint, request.method, str(response.status_code))
+        REQUEST_DB_TIME.observe(g.get('db_time', 0.0), endpoint)
+        if g.get('db_statements'):
+            DB_STATEMENTS_TOTAL.inc(endpoint, amount=g.db_statements)
+    return response
+
+@app.after_request
+def report_query_trace(response):
+    """Log slow queries and N+1 shapes, and in debug mode a request summary."""
+    trace = g.pop('query_trace', None)
+    if trace:
+        # EXPLAINs run below must not count towards the request's own totals
+        db_time, db_statements = g.get('db_time', 0.0), g.get('db_statements', 0)
+        findings, summary = summarize_query_trace(trace, request.endpoint or 'unmatched')
+        g.db_time, g.db_statements = db_time, db_statements
+        g.pop('query_trace', None)
+        for finding in findings:
+            app.logger.warning(json.dumps(finding, default=str))
+        if app.debug:
+            app.logger.info(json.dumps(summary, default=str))
+    return response
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', COMPACT_MIMETYPE, 'application/javascript',
+    'text/html', 'text/css', 'text/plain'
+}
+
+@app.after_request
+def compress_response(response):
+    """Gzip- or brotli-encode text responses of ``COMPRESS_MIN_BYTES`` or more."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.content_length is None or response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    
+    encodings = request.accept_encodings
+    if brotli is not None and encodings['br']:
+        body, encoding = brotli.compress(response.get_data(), quality=BROTLI_QUALITY), 'br'
+    elif encodings['gzip']:
+        body, encoding = gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL), 'gzip'
+    else:
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # The encoded body differs byte for byte, so a strong ETag would lie
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness probe: 200 once the startup warm-up has finished, 503 before."""
+    status = warm_up.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose metrics in the Prometheus text format."""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.errorhandler(InvalidUsage)
 def handle_invalid_usage(error):
     """Handle InvalidUsage exceptions."""
@@ -789,18 +3589,224 @@ def handle_invalid_usage(error):
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection."""
+    join_room(UNSUBSCRIBED_ROOM)
+    SOCKET_CLIENTS.inc()
     app.logger.info('Client connected')
 
+def _subscription_rooms(data):
+    """Translate a subscribe/unsubscribe payload into room names."""
+    data = data or {}
+    rooms = []
+    for view in data.get('views', []):
+        if view not in VIEWS:
+            raise ValueError(f'Unknown view: {view}')
+        rooms.append(f'view:{view}')
+    for table_id in data.get('tables', []):
+        rooms.append(f'table:{int(table_id)}')
+    for station in data.get('stations', []):
+        if station not in STATION_NAMES:
+            raise ValueError(f'Unknown station: {station}')
+        rooms.append(kitchen_room(station))
+    return rooms
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Join view, table and station rooms instead of the global feed."""
+    try:
+        rooms = _subscription_rooms(data)
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}
+    leave_room(UNSUBSCRIBED_ROOM)
+    for room in rooms:
+        join_room(room)
+    return {'success': True, 'rooms': rooms}
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Leave the given view, table and station rooms."""
+    try:
+        rooms = _subscription_rooms(data)
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}
+    for room in rooms:
+        leave_room(room)
+    return {'success': True, 'rooms': rooms}
+
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
+    SOCKET_CLIENTS.dec()
     app.logger.info('Client disconnected')
 
+@app.cli.command('archive-orders')
+@click.option('--older-than-days', type=float, default=None,
+              help='Minimum age of closed items to move (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None,
+              help='Items moved per transaction (default: ARCHIVE_BATCH_SIZE).')
+def archive_orders_command(older_than_days, batch_size):
+    """Move old completed/cancelled items into the archive now."""
+    moved = archive_closed_items(older_than_days=older_than_days, batch_size=batch_size)
+    click.echo(f'Archived {moved} order item(s).')
+    purged = purge_idempotency_keys()
+    click.echo(f'Purged {purged} expired idempotency key(s).')
+
+@app.cli.command('seed-history')
+@click.option('--days', type=int, default=30, show_default=True,
+              help='Business days of history to generate, ending yesterday.')
+@click.option('--orders-per-day', type=int, default=300, show_default=True,
+              help='Orders per day; each order has 1-4 items.')
+@click.option('--seed', type=int, default=None, help='Random seed for repeatable data.')
+def seed_history_command(days, orders_per_day, seed):
+    """Insert synthetic closed order history for load testing.
+
+    Each order is a closed check whose items are completed (a few
+    cancelled) between 11:00 and 23:00 of each day, on the existing tables
+    and menus. Items older than ARCHIVE_AFTER_DAYS are moved to the archive
+    by the next archival run.
+    """
+    rng = random.Random(seed)
+    first_day = business_day_range()[0] - timedelta(days=days)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM tables")
+        table_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id, price FROM menus")
+        menus = cursor.fetchall()
+        if not table_ids or not menus:
+            raise click.ClickException('Create tables and menus before seeding history.')
+
+        # Each order is one closed check: (table_id, opened_at, closed_at, item rows)
+        orders = []
+        inserted = 0
+
+        def flush():
+            cursor.execute(f"""
+                INSERT INTO table_checks (table_id, status, opened_at, closed_at)
+                VALUES {', '.join(["(%s, 'closed', %s, %s)"] * len(orders))}
+                RETURNING id
+            """, [value for order in orders for value in order[:3]])
+            check_ids = [row[0] for row in cursor.fetchall()]
+            rows = [(order[0], check_id, *row) for order, check_id in zip(orders, check_ids) for row in order[3]]
+            cursor.execute(f"""
+                INSERT INTO order_items
+                    (table_id, check_id, menu_id, quantity, unit_price, status, created_at, updated_at)
+                VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))}
+            """, [value for row in rows for value in row])
+            apply_sales_deltas(cursor, sales_rollup_deltas(
+                (created_at, menu_id, table_id, quantity, quantity * price, None, status)
+                for table_id, _, menu_id, quantity, price, status, created_at, _ in rows
+            ))
+            conn.commit()
+            orders.clear()
+
+        for day in range(days):
+            opening = (first_day + timedelta(days=day)).replace(hour=11, minute=0, second=0, microsecond=0)
+            for _ in range(orders_per_day):
+                table_id = rng.choice(table_ids)
+                created_at = opening + timedelta(seconds=rng.uniform(0, 12 * 3600))
+                items = []
+                for _ in range(rng.randint(1, 4)):
+                    menu_id, price = rng.choice(menus)
+                    status = ORDER_STATUS['CANCELLED'] if rng.random() < 0.05 else ORDER_STATUS['COMPLETED']
+                    closed_at = created_at + timedelta(minutes=rng.uniform(5, 90))
+                    items.append((menu_id, rng.choice((1, 1, 1, 2, 2, 3)), price,
+                                  status, created_at, closed_at))
+                orders.append((table_id, created_at, max(item[5] for item in items), items))
+                inserted += len(items)
+                if len(orders) * 4 >= ORDER_INSERT_BATCH_SIZE:
+                    flush()
+        if orders:
+            flush()
+    stats_summary_cache.invalidate()
+    click.echo(f'Inserted {inserted} historical order item(s) over {days} day(s).')
+
+@app.cli.command('verify-table-counters')
+@click.option('--repair', is_flag=True, help='Rewrite mismatching counters from real counts.')
+def verify_table_counters_command(repair):
+    """Check tables.active_items against the order items."""
+    with db_connection() as conn:
+        mismatches = verify_table_counters(conn, repair=repair)
+    for mismatch in mismatches:
+        click.echo(
+            f"{mismatch['table_name']} (id {mismatch['table_id']}): "
+            f"active_items {mismatch['active_items']} -> {mismatch['expected_active_items']}, "
+            f"status {mismatch['status']} -> {mismatch['expected_status']}"
+        )
+    if not mismatches:
+        click.echo('All table counters are consistent.')
+    elif repair:
+        click.echo(f'Repaired {len(mismatches)} table(s).')
+    else:
+        click.echo(f'{len(mismatches)} table(s) out of sync; rerun with --repair to fix.')
+        raise SystemExit(1)
+
+@app.cli.command('rebuild-sales-rollups')
+@click.option('--from', 'start', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='First business day to rebuild (default: the oldest order item).')
+@click.option('--to', 'end', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last business day to rebuild, inclusive (default: today).')
+def rebuild_sales_rollups_command(start, end):
+    """Recompute the hourly sales rollups from order history."""
+    cutoff = timedelta(hours=BUSINESS_DAY_CUTOFF_HOUR)
+    if start is None:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT LEAST(
+                    COALESCE((SELECT MIN(created_at) FROM order_items), NOW()),
+                    COALESCE((SELECT MIN(created_at) FROM order_items_archive), NOW())
+                )
+            """)
+            start = business_day_range(cursor.fetchone()[0])[0]
+            cursor.close()
+    else:
+        start += cutoff
+    end = business_day_range()[1] if end is None else end + cutoff + timedelta(days=1)
+    if start >= end:
+        raise click.BadParameter('--from must not be after --to')
+    written = rebuild_sales_rollups(start, end)
+    click.echo(f'Rebuilt {written} rollup row(s) from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}.')
+
+@app.cli.command('export-orders')
+@click.option('--from', 'start', type=click.DateTime(formats=['%Y-%m-%d']), required=True,
+              help='First business day to export.')
+@click.option('--to', 'end', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last business day to export, inclusive (default: today).')
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv',
+              show_default=True, help='Output format.')
+@click.option('--status', 'statuses', multiple=True, type=click.Choice(sorted(ORDER_STATUS.values())),
+              help='Only export items in this status; repeat for several.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', type=click.File('wb'), default='-', show_default=True,
+              help='File to write.')
+def export_orders_command(start, end, fmt, statuses, compress, output):
+    """Stream order history with menu and table names as CSV or NDJSON."""
+    cutoff = timedelta(hours=BUSINESS_DAY_CUTOFF_HOUR)
+    start += cutoff
+    end = business_day_range()[1] if end is None else end + cutoff + timedelta(days=1)
+    if start >= end:
+        raise click.BadParameter('--from must not be after --to')
+    for chunk in export_order_items(start, end, fmt, list(statuses), compress):
+        output.write(chunk)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Build fingerprinted, precompressed CSS and JS into dist/."""
+    manifest = build_assets(app.static_folder, asset_manifest.directory)
+    for source, target in sorted(manifest.items()):
+        click.echo(f'{source} -> {target}')
+    if brotli is None:
+        click.echo('brotli is not installed; only gzip variants were written.')
+
 if __name__ == '__main__':
     debug = os.environ.get('FLASK_ENV') == 'development'
+    # With the reloader this process only watches files and restarts the
+    # serving child, which Werkzeug marks with WERKZEUG_RUN_MAIN
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     socketio.run(app, 
         host='0.0.0.0', 
-        port=5555, 
+        port=int(os.environ.get('PORT', '5555')), 
         debug=debug,
         use_reloader=debug
     )
@@ -0,0 +1,402 @@
+"""
+Dinner Rush Load Generator
+--------------------------
+
+Simulates a busy service against a running POS server:
+
+- ``--tablets`` POS tablets post orders to ``/api/orders``, reload the
+  table's open check like pos.js, now and then page through its past
+  checks and now and then check a table out
+- ``--screens`` kitchen screens follow the ticket.html pattern: subscribe
+  to the kitchen view over Socket.IO, load ``/api/orders`` and the first
+  completed page, and reload the board whenever they see a gap in ``seq``
+- ``--dashboards`` dashboards poll the stats summary and table list
+
+At the end it prints p50/p95/p99 latency and throughput per endpoint, and
+the delay between a tablet sending an order and each kitchen screen
+receiving its ``new_orders`` event.
+
+``--ramp 10,20,40,80`` runs one ``--duration`` stage per tablet count
+instead and prints a capacity table: order latency, propagation delay and
+the server's pool waits and executor ``max_in_flight`` per stage, the
+largest stage that stayed within ``--slo-ms`` without errors, and the
+first server limit that was reached.
+
+Usage:
+    pip install -r bench/requirements.txt
+    python bench/dinner_rush.py --url http://localhost:5000 --tablets 12 --screens 3
+    python bench/dinner_rush.py --url http://localhost:5000 --ramp 10,20,40,80 --screens 3
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import requests
+import socketio
+
+ITEM_EVENTS = (
+    'new_orders', 'order_status_updated', 'order_updated', 'order_completed',
+    'order_item_deleted', 'order_notes_updated', 'order_items_renamed', 'board_rebuilt'
+)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class Recorder:
+    """Thread-safe collection of latency samples keyed by endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.propagation = []
+        self.events = defaultdict(int)
+        self.resyncs = 0
+
+    def request(self, session, method, url, path, **kwargs):
+        endpoint = f"{method} {re.sub(r'/[0-9]+(?=/|$)', '/<id>', path)}"
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url + path, timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+        return response if ok else None
+
+    def event(self, name):
+        with self._lock:
+            self.events[name] += 1
+
+    def propagated(self, delay):
+        with self._lock:
+            self.propagation.append(delay)
+
+    def resync(self):
+        with self._lock:
+            self.resyncs += 1
+
+
+class DinnerRush:
+    def __init__(self, args):
+        self.args = args
+        self.url = args.url.rstrip('/')
+        self.recorder = Recorder()
+        self.stop = threading.Event()
+        # bench marker -> perf_counter() when the order was sent
+        self.sent_at = {}
+
+    def load_catalog(self):
+        session = requests.Session()
+        self.tables = [t['id'] for t in session.get(f'{self.url}/api/tables', timeout=10).json()]
+        self.menus = [m['id'] for m in session.get(f'{self.url}/api/menus', timeout=10).json()
+                      if m.get('is_available', True)]
+        if not self.tables or not self.menus:
+            raise SystemExit('The server has no tables or menus to order from.')
+
+    def think(self, rng, mean):
+        self.stop.wait(rng.expovariate(1 / mean) if mean > 0 else 0)
+
+    def tablet(self, index):
+        rng = random.Random(f'{self.args.seed}-tablet-{index}')
+        session = requests.Session()
+        while not self.stop.is_set():
+            table_id = rng.choice(self.tables)
+            marker = f'bench:{uuid.uuid4().hex}'
+            items = [{
+                'table_id': table_id,
+                'menu_id': rng.choice(self.menus),
+                'quantity': rng.randint(1, 3),
+                'notes': marker
+            } for _ in range(rng.randint(1, self.args.max_items))]
+            self.sent_at[marker] = time.perf_counter()
+            self.recorder.request(session, 'POST', self.url, '/api/orders', json={'items': items})
+            self.recorder.request(session, 'GET', self.url, f'/api/tables/{table_id}/check',
+                                  params={'format': 'compact'})
+            if rng.random() < self.args.history_rate:
+                self.past_checks(session, table_id)
+            if rng.random() < self.args.checkout_rate:
+                self.recorder.request(session, 'POST', self.url, '/api/orders/complete',
+                                      json={'table_id': table_id})
+            self.think(rng, self.args.think_time)
+
+    def past_checks(self, session, table_id, pages=2):
+        """Page through the table's closed checks, newest first."""
+        params = {}
+        for _ in range(pages):
+            response = self.recorder.request(session, 'GET', self.url,
+                                             f'/api/tables/{table_id}/checks', params=params)
+            next_cursor = response.json().get('next_cursor') if response is not None else None
+            if not next_cursor:
+                break
+            params = {'cursor': next_cursor}
+
+    def screen(self, index):
+        session = requests.Session()
+        client = socketio.Client(reconnection=False)
+        state = {'epoch': None, 'seq': None, 'resyncing': False}
+        lock = threading.Lock()
+
+        def refetch():
+            response = self.recorder.request(session, 'GET', self.url, '/api/orders')
+            with lock:
+                if response is not None:
+                    state['epoch'] = response.headers.get('X-Event-Epoch')
+                    state['seq'] = int(response.headers.get('X-Event-Seq', 0))
+                state['resyncing'] = False
+            self.recorder.request(session, 'GET', self.url, '/api/orders/completed',
+                                  params={'cursor': '', 'count': 'estimate'})
+
+        def handler(name):
+            def on_event(data):
+                received = time.perf_counter()
+                if data.get('room') != 'view:kitchen':
+                    return
+                self.recorder.event(name)
+                if name == 'new_orders':
+                    # One sample per order, even when coalesced with others
+                    markers = {item.get('notes') for item in data.get('items', ())}
+                    for marker in markers:
+                        sent = self.sent_at.get(marker)
+                        if sent is not None:
+                            self.recorder.propagated(received - sent)
+                with lock:
+                    if state['resyncing']:
+                        return
+                    gap = (state['epoch'] != data.get('epoch')
+                           or state['seq'] is None or data.get('seq') != state['seq'] + 1)
+                    if gap:
+                        state['resyncing'] = True
+                    else:
+                        state['seq'] = data['seq']
+                if gap:
+                    self.recorder.resync()
+                    threading.Thread(target=refetch, daemon=True).start()
+            return on_event
+
+        for name in ITEM_EVENTS:
+            client.on(name, handler(name))
+        client.connect(self.url, transports=['websocket'])
+        state['resyncing'] = True
+        client.emit('subscribe', {'views': ['kitchen']}, callback=lambda ack: refetch())
+        self.stop.wait()
+        client.disconnect()
+
+    def dashboard(self, index):
+        rng = random.Random(f'{self.args.seed}-dashboard-{index}')
+        session = requests.Session()
+        while not self.stop.is_set():
+            self.recorder.request(session, 'GET', self.url, '/api/stats/summary')
+            self.recorder.request(session, 'GET', self.url, '/api/tables')
+            self.think(rng, self.args.poll_interval)
+
+    def server_stats(self):
+        stats = {}
+        for name, path in (('db', '/api/stats/db'), ('events', '/api/stats/events')):
+            try:
+                stats[name] = requests.get(self.url + path, timeout=10).json()
+            except (requests.RequestException, ValueError):
+                stats[name] = None
+        return stats
+
+    def run(self):
+        self.load_catalog()
+        workers = (
+            [threading.Thread(target=self.screen, args=(i,), daemon=True) for i in range(self.args.screens)]
+            + [threading.Thread(target=self.dashboard, args=(i,), daemon=True) for i in range(self.args.dashboards)]
+            + [threading.Thread(target=self.tablet, args=(i,), daemon=True) for i in range(self.args.tablets)]
+        )
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        try:
+            self.stop.wait(self.args.duration)
+        finally:
+            self.stop.set()
+            for worker in workers:
+                worker.join(timeout=10)
+        elapsed = time.perf_counter() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        recorder = self.recorder
+        endpoints = {}
+        for endpoint, samples in sorted(recorder.latencies.items()):
+            samples = sorted(samples)
+            endpoints[endpoint] = {
+                'count': len(samples),
+                'errors': recorder.errors[endpoint],
+                'rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 99) * 1000, 2),
+                'max_ms': round(samples[-1] * 1000, 2)
+            }
+        propagation = sorted(recorder.propagation)
+        server = self.server_stats()
+        return {
+            'config': vars(self.args),
+            'elapsed_s': round(elapsed, 2),
+            'requests': sum(e['count'] for e in endpoints.values()),
+            'throughput_rps': round(sum(e['count'] for e in endpoints.values()) / elapsed, 2),
+            'endpoints': endpoints,
+            'propagation': {
+                'count': len(propagation),
+                'p50_ms': round(percentile(propagation, 50) * 1000, 2) if propagation else None,
+                'p95_ms': round(percentile(propagation, 95) * 1000, 2) if propagation else None,
+                'p99_ms': round(percentile(propagation, 99) * 1000, 2) if propagation else None
+            },
+            'events_received': dict(recorder.events),
+            'screen_resyncs': recorder.resyncs,
+            'server': server
+        }
+
+
+def print_report(result):
+    print(f"\n{result['requests']} requests in {result['elapsed_s']}s "
+          f"({result['throughput_rps']} req/s)\n")
+    print(f"{'endpoint':<40} {'count':>7} {'err':>5} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, row in result['endpoints'].items():
+        print(f"{endpoint:<40} {row['count']:>7} {row['errors']:>5} {row['rps']:>8} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+    prop = result['propagation']
+    print(f"\nOrder -> kitchen screen ({prop['count']} deliveries): "
+          f"p50 {prop['p50_ms']} ms, p95 {prop['p95_ms']} ms, p99 {prop['p99_ms']} ms")
+    print(f"Events received: {result['events_received']}, screen resyncs: {result['screen_resyncs']}")
+    if result['server'].get('events'):
+        events = result['server']['events']
+        print(f"Server events: {events.get('events_in')} in, {events.get('messages_out')} out")
+    if result['server'].get('db'):
+        db = result['server']['db']
+        print(f"Server pool: {db.get('checkouts')} checkouts, {db.get('timeouts')} timeouts, "
+              f"avg wait {db.get('wait_time_avg')}s, max wait {db.get('wait_time_max')}s")
+
+
+def ramp_stage(result, before):
+    """Summarize one ramp stage; pool counters are deltas over the stage."""
+    orders = result['endpoints'].get('POST /api/orders', {})
+    db, start = result['server'].get('db') or {}, before.get('db') or {}
+    checkouts = db.get('checkouts', 0) - start.get('checkouts', 0)
+    wait = db.get('wait_time_total', 0) - start.get('wait_time_total', 0)
+    executor = db.get('executor') or {}
+    return {
+        'tablets': result['config']['tablets'],
+        'screens': result['config']['screens'],
+        'throughput_rps': result['throughput_rps'],
+        'errors': sum(e['errors'] for e in result['endpoints'].values()),
+        'orders_p95_ms': orders.get('p95_ms'),
+        'orders_p99_ms': orders.get('p99_ms'),
+        'propagation_p95_ms': result['propagation']['p95_ms'],
+        'propagation_p99_ms': result['propagation']['p99_ms'],
+        'pool_size': db.get('size'),
+        'pool_wait_avg_ms': round(wait / checkouts * 1000, 2) if checkouts else 0.0,
+        'pool_wait_max_ms': round(db.get('wait_time_max', 0) * 1000, 2),
+        'pool_timeouts': db.get('timeouts', 0) - start.get('timeouts', 0),
+        'executor_threads': executor.get('threads'),
+        'max_in_flight': executor.get('max_in_flight')
+    }
+
+
+def saturated_limit(stage):
+    """Name the first server limit a ramp stage ran into, or ``None``."""
+    if stage['pool_timeouts'] or stage['pool_wait_avg_ms'] >= 1:
+        return 'DB_POOL_SIZE'
+    if stage['executor_threads'] and stage['max_in_flight'] >= stage['executor_threads']:
+        return 'DB_THREADS'
+    if stage['errors']:
+        return 'WORKER_CONNECTIONS or client errors'
+    return None
+
+
+def run_ramp(args):
+    stages = []
+    for tablets in args.ramp:
+        stage_args = copy.copy(args)
+        stage_args.tablets = tablets
+        rush = DinnerRush(stage_args)
+        before = rush.server_stats()
+        stages.append(ramp_stage(rush.run(), before))
+    sustained = [s for s in stages
+                 if not s['errors'] and s['orders_p99_ms'] is not None
+                 and s['orders_p99_ms'] <= args.slo_ms]
+    limits = [(s['tablets'], saturated_limit(s)) for s in stages if saturated_limit(s)]
+    return {
+        'config': vars(args),
+        'stages': stages,
+        'sustained_tablets': sustained[-1]['tablets'] if sustained else None,
+        'first_limit': {'tablets': limits[0][0], 'setting': limits[0][1]} if limits else None
+    }
+
+
+def print_ramp(result):
+    print(f"\n{'tablets':>7} {'req/s':>8} {'err':>5} {'order p95':>10} {'order p99':>10} "
+          f"{'prop p95':>9} {'prop p99':>9} {'pool wait':>10} {'timeouts':>8} {'in flight':>10}")
+    for s in result['stages']:
+        print(f"{s['tablets']:>7} {s['throughput_rps']:>8} {s['errors']:>5} "
+              f"{s['orders_p95_ms']!s:>10} {s['orders_p99_ms']!s:>10} "
+              f"{s['propagation_p95_ms']!s:>9} {s['propagation_p99_ms']!s:>9} "
+              f"{s['pool_wait_avg_ms']:>10} {s['pool_timeouts']:>8} "
+              f"{s['max_in_flight']!s:>5}/{s['executor_threads']!s:<4}")
+    print(f"\nSustained within {result['config']['slo_ms']} ms p99: "
+          f"{result['sustained_tablets']} tablets with {result['config']['screens']} screens")
+    limit = result['first_limit']
+    print(f"First limit reached: {limit['setting']} at {limit['tablets']} tablets" if limit
+          else 'No server limit reached')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:5000', help='Server base URL')
+    parser.add_argument('--tablets', type=int, default=10, help='POS tablets posting orders')
+    parser.add_argument('--screens', type=int, default=2, help='Kitchen screens on Socket.IO')
+    parser.add_argument('--dashboards', type=int, default=1, help='Dashboards polling stats')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+    parser.add_argument('--think-time', type=float, default=2.0,
+                        help='Mean seconds between orders per tablet')
+    parser.add_argument('--max-items', type=int, default=4, help='Maximum items per order')
+    parser.add_argument('--checkout-rate', type=float, default=0.1,
+                        help='Probability a tablet checks the table out after ordering')
+    parser.add_argument('--history-rate', type=float, default=0.05,
+                        help="Probability a tablet pages through the table's past checks after ordering")
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help='Mean seconds between dashboard polls')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--ramp', type=lambda value: [int(n) for n in value.split(',')],
+                        help='Comma-separated tablet counts to run one stage each')
+    parser.add_argument('--slo-ms', type=float, default=250,
+                        help='p99 order latency a ramp stage must stay within')
+    parser.add_argument('--json', metavar='PATH', help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    if args.ramp:
+        result = run_ramp(args)
+        print_ramp(result)
+    else:
+        result = DinnerRush(args).run()
+        print_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
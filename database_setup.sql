@@ -7,9 +7,24 @@ CREATE TABLE IF NOT EXISTS tables (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(50) NOT NULL,
     status ENUM('available', 'occupied') DEFAULT 'available',
+    active_items INT NOT NULL DEFAULT 0,
+    current_check_id INT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Table checks (sessions)
+-- A check is opened by the first order at a free table and closed at
+-- checkout; tables.current_check_id points at the open one.
+CREATE TABLE IF NOT EXISTS table_checks (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    table_id INT NOT NULL,
+    status ENUM('open', 'closed') NOT NULL DEFAULT 'open',
+    opened_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    closed_at TIMESTAMP NULL,
+    FOREIGN KEY (table_id) REFERENCES tables(id) ON DELETE RESTRICT,
+    INDEX idx_check_table (table_id, id)
+);
+
 -- Create menus table
 CREATE TABLE IF NOT EXISTS menus (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -26,6 +41,7 @@ CREATE TABLE IF NOT EXISTS menus (
 CREATE TABLE IF NOT EXISTS order_items (
     id INT AUTO_INCREMENT PRIMARY KEY,
     table_id INT NOT NULL,
+    check_id INT NULL,
     menu_id INT NOT NULL,
     quantity INT NOT NULL DEFAULT 1,
     unit_price DECIMAL(10,2) NOT NULL,
@@ -38,35 +54,91 @@ CREATE TABLE IF NOT EXISTS order_items (
     FOREIGN KEY (menu_id) REFERENCES menus(id) ON DELETE RESTRICT
 );
 
+-- Archive of closed order items
+-- Completed and cancelled items are moved here by the archival job once
+-- they are older than ARCHIVE_AFTER_DAYS, keeping order_items small.
+CREATE TABLE IF NOT EXISTS order_items_archive (
+    id INT PRIMARY KEY,
+    table_id INT NOT NULL,
+    check_id INT NULL,
+    menu_id INT NOT NULL,
+    quantity INT NOT NULL,
+    unit_price DECIMAL(10,2) NOT NULL,
+    subtotal DECIMAL(10,2) NOT NULL,
+    status ENUM('pending', 'inprogress', 'completed', 'cancelled') NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_archive_status_created (status, created_at, id),
+    INDEX idx_archive_table_created (table_id, created_at),
+    INDEX idx_archive_created (created_at),
+    INDEX idx_archive_check (check_id, created_at, id)
+);
+
+-- Idempotency keys for order creation
+-- Remembers which items a client-supplied key created so retried and
+-- replayed orders are not applied twice. request_hash identifies the
+-- order the key was first used for, so reusing it for another order is
+-- refused. Keys older than IDEMPOTENCY_KEY_TTL_HOURS are purged by the
+-- archival job.
+CREATE TABLE IF NOT EXISTS order_idempotency_keys (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    request_hash CHAR(64) NULL,
+    item_ids TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_idempotency_created (created_at)
+);
+
+-- Hourly sales rollups
+-- Completed and cancelled totals per hour ordered, menu item and table.
+-- The application updates them as item statuses change; rebuild them
+-- from order history with `flask rebuild-sales-rollups`.
+CREATE TABLE IF NOT EXISTS sales_rollup_hourly (
+    bucket_hour DATETIME NOT NULL,
+    menu_id INT NOT NULL,
+    table_id INT NOT NULL,
+    completed_items INT NOT NULL DEFAULT 0,
+    completed_quantity INT NOT NULL DEFAULT 0,
+    completed_sales DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cancelled_items INT NOT NULL DEFAULT 0,
+    cancelled_quantity INT NOT NULL DEFAULT 0,
+    cancelled_sales DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_hour, menu_id, table_id)
+);
+
 -- Create indexes
 CREATE INDEX idx_table_status ON tables(status);
 CREATE INDEX idx_menu_category ON menus(category);
 CREATE INDEX idx_orderitem_status ON order_items(status);
 CREATE INDEX idx_orderitem_table ON order_items(table_id);
+CREATE INDEX idx_orderitem_table_status ON order_items(table_id, status);
+CREATE INDEX idx_orderitem_status_created ON order_items(status, created_at, id);
 CREATE INDEX idx_orderitem_created ON order_items(created_at);
 CREATE INDEX idx_orderitem_updated ON order_items(updated_at);
+CREATE INDEX idx_orderitem_check ON order_items(check_id, created_at, id);
 
--- Create views for analytics
+-- Create views for analytics (read from the rollups, including archived items)
 CREATE OR REPLACE VIEW daily_sales AS
 SELECT 
-    DATE(created_at) as sale_date,
-    COUNT(*) as total_orders,
-    SUM(subtotal) as total_sales,
-    AVG(subtotal) as average_order_value
-FROM order_items
-WHERE status = 'completed'
-GROUP BY DATE(created_at);
+    DATE(bucket_hour) as sale_date,
+    SUM(completed_items) as total_orders,
+    SUM(completed_sales) as total_sales,
+    SUM(completed_sales) / SUM(completed_items) as average_order_value
+FROM sales_rollup_hourly
+GROUP BY DATE(bucket_hour)
+HAVING SUM(completed_items) > 0;
 
 CREATE OR REPLACE VIEW popular_items AS
 SELECT 
     m.name,
     m.category,
-    SUM(oi.quantity) as total_quantity,
-    SUM(oi.subtotal) as total_revenue
-FROM order_items oi
-JOIN menus m ON oi.menu_id = m.id
-WHERE oi.status = 'completed'
+    SUM(r.completed_quantity) as total_quantity,
+    SUM(r.completed_sales) as total_revenue
+FROM sales_rollup_hourly r
+JOIN menus m ON r.menu_id = m.id
 GROUP BY m.id
+HAVING SUM(r.completed_items) > 0
 ORDER BY total_quantity DESC;
 
 -- Insert sample data
@@ -102,58 +174,46 @@ INSERT INTO order_items (table_id, menu_id, quantity, unit_price, status, notes)
 (2, 3, 3, 12.99, 'inprogress', 'With lime'),
 (3, 4, 1, 14.99, 'completed', 'Regular');
 
--- Create triggers
-DELIMITER //
-
-CREATE TRIGGER after_orderitem_insert
-AFTER INSERT ON order_items
-FOR EACH ROW
-BEGIN
-    UPDATE tables t
-    SET status = IF(
-        EXISTS(
-            SELECT 1 FROM order_items 
-            WHERE table_id = NEW.table_id 
-            AND status NOT IN ('completed', 'cancelled')
-        ),
-        'occupied', 'available'
-    )
-    WHERE t.id = NEW.table_id;
-END//
-
-CREATE TRIGGER after_orderitem_update
-AFTER UPDATE ON order_items
-FOR EACH ROW
-BEGIN
-    UPDATE tables t
-    SET status = IF(
-        EXISTS(
-            SELECT 1 FROM order_items 
-            WHERE table_id = NEW.table_id 
-            AND status NOT IN ('completed', 'cancelled')
-        ),
-        'occupied', 'available'
-    )
-    WHERE t.id = NEW.table_id;
-END//
-
-CREATE TRIGGER after_orderitem_delete
-AFTER DELETE ON order_items
-FOR EACH ROW
-BEGIN
-    UPDATE tables t
-    SET status = IF(
-        EXISTS(
-            SELECT 1 FROM order_items 
-            WHERE table_id = OLD.table_id 
-            AND status NOT IN ('completed', 'cancelled')
-        ),
-        'occupied', 'available'
-    )
-    WHERE t.id = OLD.table_id;
-END//
-
-DELIMITER ;
+-- Table status counters
+-- tables.active_items and tables.status are maintained by the application
+-- once per write statement (see apply_table_deltas in app.py) instead of by
+-- per-row triggers. Seed them for the sample orders above.
+UPDATE tables t
+SET t.active_items = (
+        SELECT COUNT(*) FROM order_items oi
+        WHERE oi.table_id = t.id
+        AND oi.status IN ('pending', 'inprogress')
+    ),
+    t.status = IF(t.active_items > 0, 'occupied', 'available');
+
+-- Open a check for every table with active items and attach the items
+INSERT INTO table_checks (table_id, opened_at)
+SELECT t.id, MIN(oi.created_at)
+FROM tables t
+JOIN order_items oi ON oi.table_id = t.id AND oi.status IN ('pending', 'inprogress')
+WHERE t.current_check_id IS NULL
+GROUP BY t.id;
+
+UPDATE tables t
+JOIN table_checks c ON c.table_id = t.id AND c.status = 'open'
+SET t.current_check_id = c.id
+WHERE t.current_check_id IS NULL;
+
+UPDATE order_items oi
+JOIN tables t ON oi.table_id = t.id
+SET oi.check_id = t.current_check_id
+WHERE oi.check_id IS NULL
+AND oi.status IN ('pending', 'inprogress')
+AND t.current_check_id IS NOT NULL;
+
+-- Sales rollups for the sample orders above
+INSERT INTO sales_rollup_hourly
+    (bucket_hour, menu_id, table_id, completed_items, completed_quantity, completed_sales)
+SELECT DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00'), menu_id, table_id,
+    COUNT(*), SUM(quantity), SUM(subtotal)
+FROM order_items
+WHERE status = 'completed'
+GROUP BY DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00'), menu_id, table_id;
 
 -- Create a dedicated user for the POS application
 DROP USER IF EXISTS 'pos_user'@'localhost';
@@ -0,0 +1,142 @@
+-- Schema upgrades for existing installations
+-- database_setup.sql already contains all of these changes for fresh
+-- installs. Every statement is idempotent, so this file can be re-run:
+--   mysql -u root -p < database_upgrade.sql
+USE pos;
+
+-- Maintained table counters replace the per-row table status triggers
+DROP TRIGGER IF EXISTS after_orderitem_insert;
+DROP TRIGGER IF EXISTS after_orderitem_update;
+DROP TRIGGER IF EXISTS after_orderitem_delete;
+
+ALTER TABLE tables ADD COLUMN IF NOT EXISTS active_items INT NOT NULL DEFAULT 0 AFTER status;
+CREATE INDEX IF NOT EXISTS idx_orderitem_table_status ON order_items(table_id, status);
+
+UPDATE tables t
+SET t.active_items = (
+        SELECT COUNT(*) FROM order_items oi
+        WHERE oi.table_id = t.id
+        AND oi.status IN ('pending', 'inprogress')
+    ),
+    t.status = IF(t.active_items > 0, 'occupied', 'available');
+
+-- Keyset pagination of completed orders on (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_orderitem_status_created ON order_items(status, created_at, id);
+
+-- Archive of closed order items
+-- Completed and cancelled items are moved here by the archival job once
+-- they are older than ARCHIVE_AFTER_DAYS, keeping order_items small.
+CREATE TABLE IF NOT EXISTS order_items_archive (
+    id INT PRIMARY KEY,
+    table_id INT NOT NULL,
+    menu_id INT NOT NULL,
+    quantity INT NOT NULL,
+    unit_price DECIMAL(10,2) NOT NULL,
+    subtotal DECIMAL(10,2) NOT NULL,
+    status ENUM('pending', 'inprogress', 'completed', 'cancelled') NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_archive_status_created (status, created_at, id),
+    INDEX idx_archive_table_created (table_id, created_at),
+    INDEX idx_archive_created (created_at)
+);
+
+-- Idempotency keys for order creation
+-- Remembers which items a client-supplied key created so retried and
+-- replayed orders are not applied twice. request_hash identifies the
+-- order the key was first used for, so reusing it for another order is
+-- refused. Keys older than IDEMPOTENCY_KEY_TTL_HOURS are purged by the
+-- archival job.
+CREATE TABLE IF NOT EXISTS order_idempotency_keys (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    request_hash CHAR(64) NULL,
+    item_ids TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_idempotency_created (created_at)
+);
+ALTER TABLE order_idempotency_keys ADD COLUMN IF NOT EXISTS request_hash CHAR(64) NULL AFTER idempotency_key;
+
+-- Table checks (sessions)
+-- A check is opened by the first order at a free table and closed at
+-- checkout; tables.current_check_id points at the open one.
+CREATE TABLE IF NOT EXISTS table_checks (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    table_id INT NOT NULL,
+    status ENUM('open', 'closed') NOT NULL DEFAULT 'open',
+    opened_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    closed_at TIMESTAMP NULL,
+    FOREIGN KEY (table_id) REFERENCES tables(id) ON DELETE RESTRICT,
+    INDEX idx_check_table (table_id, id)
+);
+
+ALTER TABLE tables ADD COLUMN IF NOT EXISTS current_check_id INT NULL AFTER active_items;
+ALTER TABLE order_items ADD COLUMN IF NOT EXISTS check_id INT NULL AFTER table_id;
+ALTER TABLE order_items_archive ADD COLUMN IF NOT EXISTS check_id INT NULL AFTER table_id;
+CREATE INDEX IF NOT EXISTS idx_orderitem_check ON order_items(check_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_archive_check ON order_items_archive(check_id, created_at, id);
+
+-- Open a check for every table with active items and attach the items
+INSERT INTO table_checks (table_id, opened_at)
+SELECT t.id, MIN(oi.created_at)
+FROM tables t
+JOIN order_items oi ON oi.table_id = t.id AND oi.status IN ('pending', 'inprogress')
+WHERE t.current_check_id IS NULL
+GROUP BY t.id;
+
+UPDATE tables t
+JOIN table_checks c ON c.table_id = t.id AND c.status = 'open'
+SET t.current_check_id = c.id
+WHERE t.current_check_id IS NULL;
+
+UPDATE order_items oi
+JOIN tables t ON oi.table_id = t.id
+SET oi.check_id = t.current_check_id
+WHERE oi.check_id IS NULL
+AND oi.status IN ('pending', 'inprogress')
+AND t.current_check_id IS NOT NULL;
+
+-- A table stays occupied while its check is open
+UPDATE tables SET status = 'occupied' WHERE current_check_id IS NOT NULL;
+
+-- Hourly sales rollups
+-- Completed and cancelled totals per hour ordered, menu item and table.
+-- The application updates them as item statuses change; rebuild them
+-- from order history with `flask rebuild-sales-rollups`.
+CREATE TABLE IF NOT EXISTS sales_rollup_hourly (
+    bucket_hour DATETIME NOT NULL,
+    menu_id INT NOT NULL,
+    table_id INT NOT NULL,
+    completed_items INT NOT NULL DEFAULT 0,
+    completed_quantity INT NOT NULL DEFAULT 0,
+    completed_sales DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cancelled_items INT NOT NULL DEFAULT 0,
+    cancelled_quantity INT NOT NULL DEFAULT 0,
+    cancelled_sales DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_hour, menu_id, table_id)
+);
+
+-- The analytics views read the rollups instead of re-aggregating order_items.
+-- Fill them once with `flask rebuild-sales-rollups` after deploying.
+CREATE OR REPLACE VIEW daily_sales AS
+SELECT 
+    DATE(bucket_hour) as sale_date,
+    SUM(completed_items) as total_orders,
+    SUM(completed_sales) as total_sales,
+    SUM(completed_sales) / SUM(completed_items) as average_order_value
+FROM sales_rollup_hourly
+GROUP BY DATE(bucket_hour)
+HAVING SUM(completed_items) > 0;
+
+CREATE OR REPLACE VIEW popular_items AS
+SELECT 
+    m.name,
+    m.category,
+    SUM(r.completed_quantity) as total_quantity,
+    SUM(r.completed_sales) as total_revenue
+FROM sales_rollup_hourly r
+JOIN menus m ON r.menu_id = m.id
+GROUP BY m.id
+HAVING SUM(r.completed_items) > 0
+ORDER BY total_quantity DESC;
@@ -34,5 +34,10 @@ while retry_count < max_retries:
         time.sleep(2)
 END
 
-# Start Flask application
-exec python app.py 
\ No newline at end of file
+# Start the application: the development server with FLASK_ENV=development,
+# gunicorn with a gevent/eventlet worker otherwise. Either way the app warms
+# up in the background and GET /readyz turns 200 once it is done.
+if [ "${FLASK_ENV}" = "development" ]; then
+    exec python app.py
+fi
+exec gunicorn -c gunicorn.conf.py app:app
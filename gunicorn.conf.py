@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for production serving
+----------------------------------------
+
+Run with ``gunicorn -c gunicorn.conf.py app:app``.
+
+The Socket.IO rooms, event sequence numbers and the active order board
+live in process memory, so this runs a single worker; concurrency comes
+from greenlets, with blocking database calls handed to a bounded thread
+pool (``DB_THREADS``).
+"""
+
+import os
+
+# Must be set before app.py is imported by the worker
+os.environ.setdefault('ASYNC_MODE', 'gevent')
+ASYNC_MODE = os.environ['ASYNC_MODE']
+
+WORKER_CLASSES = {
+    'gevent': 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker',
+    'eventlet': 'eventlet'
+}
+if ASYNC_MODE not in WORKER_CLASSES:
+    raise RuntimeError(f"ASYNC_MODE must be one of {', '.join(WORKER_CLASSES)} under gunicorn")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = 1
+worker_class = WORKER_CLASSES[ASYNC_MODE]
+# Upper bound on concurrently open client connections (HTTP and websocket)
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', '1000'))
+timeout = int(os.environ.get('WORKER_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    from app import start_background_services
+    start_background_services()
@@ -0,0 +1,137 @@
+const socket = io();
+let isConnected = false;
+let retryCount = 0;
+const MAX_RETRIES = 3;
+
+// Format currency
+const formatCurrency = (amount) => {
+    return new Intl.NumberFormat('ko-KR', {
+        style: 'currency',
+        currency: 'KRW'
+    }).format(amount);
+};
+
+socket.on('connect', () => {
+    console.log('Socket connected');
+    isConnected = true;
+    retryCount = 0;
+    socket.emit('subscribe', { views: ['dashboard'] });
+    fetchStats();
+});
+
+socket.on('connect_error', (error) => {
+    console.error('Socket connection error:', error);
+    isConnected = false;
+    handleConnectionError();
+});
+
+// Listen for updates
+[
+    'new_orders', 'order_status_updated', 'order_item_deleted',
+    'order_updated', 'order_completed', 'table_updated'
+].forEach(event => socket.on(event, fetchStats));
+
+async function fetchStats() {
+    try {
+        const summary = await fetchWithRetry('/api/stats/summary');
+
+        updateTableStats(summary.tables);
+        updateOrderStats(summary.orders);
+        updateSalesStats(summary.sales);
+
+    } catch (error) {
+        console.error('Error fetching stats:', error);
+        handleError('통계 데이터를 불러오는데 실패했습니다');
+    }
+}
+
+async function fetchWithRetry(url, retries = 0) {
+    try {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return await response.json();
+    } catch (error) {
+        if (retries < MAX_RETRIES) {
+            await new Promise(resolve => setTimeout(resolve, 1000 * (retries + 1)));
+            return fetchWithRetry(url, retries + 1);
+        }
+        throw error;
+    }
+}
+
+function updateTableStats(data) {
+    const element = document.querySelector('#active-tables .stat-value');
+    if (data && typeof data.active === 'number' && typeof data.total === 'number') {
+        element.textContent = `${data.active} / ${data.total}`;
+        element.classList.remove('error');
+    } else {
+        handleError('테이블 데이터 형식이 잘못되었습니다', element);
+    }
+}
+
+function updateOrderStats(data) {
+    const element = document.querySelector('#pending-orders .stat-value');
+    if (data && typeof data.pending === 'number') {
+        element.textContent = `${data.pending}개`;
+        element.classList.remove('error');
+    } else {
+        handleError('주문 데이터 형식이 잘못되었습니다', element);
+    }
+}
+
+function updateSalesStats(data) {
+    const element = document.querySelector('#today-sales .stat-value');
+    if (data && typeof data.total === 'number') {
+        element.textContent = formatCurrency(data.total);
+        element.classList.remove('error');
+    } else {
+        handleError('매출 데이터 형식이 잘못되었습니다', element);
+    }
+}
+
+function handleError(message, element = null) {
+    console.error(message);
+    if (element) {
+        element.textContent = '오류';
+        element.classList.add('error');
+    }
+
+    // Only show alert for critical errors
+    if (!element) {
+        const notification = document.createElement('div');
+        notification.className = 'error-notification';
+        notification.textContent = message;
+        document.body.appendChild(notification);
+
+        setTimeout(() => {
+            notification.remove();
+        }, 5000);
+    }
+}
+
+function handleConnectionError() {
+    retryCount++;
+    if (retryCount <= MAX_RETRIES) {
+        setTimeout(() => {
+            socket.connect();
+        }, 1000 * retryCount);
+    } else {
+        handleError('서버 연결에 실패했습니다. 페이지를 새로고침해주세요.');
+    }
+}
+
+// Initial load
+fetchStats();
+
+// Refresh stats periodically (every 30 seconds)
+const refreshInterval = setInterval(() => {
+    if (isConnected) fetchStats();
+}, 30000);
+
+// Cleanup
+window.addEventListener('beforeunload', () => {
+    clearInterval(refreshInterval);
+    socket.disconnect();
+});
@@ -0,0 +1,600 @@
+// Socket.io setup
+const socket = io();
+let isConnected = false;
+
+socket.on('connect', () => {
+    console.log('Socket connected');
+    isConnected = true;
+    socket.emit('subscribe', {
+        views: ['pos'],
+        tables: selectedTable ? [selectedTable.id] : []
+    });
+    replayOfflineOrders();
+    catchUpTableOrders();
+    showNotification('실시간 업데이트가 연결되었습니다', 'success');
+});
+
+socket.on('connect_error', (error) => {
+    console.error('Socket connection error:', error);
+    isConnected = false;
+    showNotification('실시간 업데이트 연결에 실패했습니다', 'error');
+});
+
+socket.on('order_status_updated', (data) => {
+    if (data.room === 'view:pos') refreshTables();
+});
+
+function mergeTableOrders(items) {
+    // Items of another check mean the table was checked out and
+    // reopened elsewhere; reload the current check instead
+    if (items.some(item => item.check_id && item.check_id !== currentCheckId)) {
+        loadTableOrders(selectedTable.id);
+        return;
+    }
+    items.forEach(item => {
+        const index = selectedTableOrders.findIndex(order => order.id === item.id);
+        if (index >= 0) {
+            if (selectedTableOrders[index].version > item.version) return;
+            selectedTableOrders[index] = { ...selectedTableOrders[index], ...item };
+        } else {
+            selectedTableOrders.unshift(item);
+        }
+    });
+    renderOrderHistory();
+}
+
+// Item changes for the selected table arrive on its table room and
+// are patched into the history without refetching
+socket.onAny((event, data) => {
+    if (!selectedTable || !data || data.room !== `table:${selectedTable.id}`) return;
+    if (!Array.isArray(data.items) || !data.items.length) return;
+    mergeTableOrders(data.items);
+});
+
+// Position in /api/orders/changes as of the last history load, so a
+// reconnect only fetches what changed while the socket was down
+let changesCursor = null;
+
+async function catchUpTableOrders() {
+    if (!selectedTable || changesCursor === null) return;
+    const tableId = selectedTable.id;
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const params = new URLSearchParams({ since: changesCursor, table_id: tableId });
+            const response = await fetch(`/api/orders/changes?${params}`);
+            if (!response.ok) return;
+            const feed = await response.json();
+            if (!selectedTable || selectedTable.id !== tableId) return;
+            if (feed.changes.length) mergeTableOrders(feed.changes);
+            changesCursor = feed.cursor;
+            hasMore = feed.has_more;
+        }
+        await refreshTables();
+    } catch (error) {
+        console.error('Error catching up table orders:', error);
+    }
+}
+
+// State management
+let selectedTable = null;
+let orderItems = [];
+let selectedTableOrders = [];
+let currentCheckId = null;
+
+// Table selection
+document.querySelectorAll('.table').forEach(button => {
+    button.addEventListener('click', async () => {
+        document.querySelectorAll('.table').forEach(b => b.classList.remove('selected'));
+        button.classList.add('selected');
+        if (selectedTable) {
+            socket.emit('unsubscribe', { tables: [selectedTable.id] });
+        }
+        selectedTable = {
+            id: parseInt(button.dataset.tableId),
+            name: button.dataset.tableName
+        };
+        document.getElementById('selected-table').textContent = selectedTable.name;
+        socket.emit('subscribe', { views: ['pos'], tables: [selectedTable.id] });
+
+        // Load table orders
+        await loadTableOrders(selectedTable.id);
+    });
+});
+
+// Rebuild item objects from a compact (dictionary-encoded) response
+function expandCompact(block) {
+    return block.rows.map(row => {
+        const item = {};
+        block.columns.forEach((column, i) => { item[column] = row[i]; });
+        const menu = block.menus[item.menu_id] || {};
+        item.menu_name = menu.name;
+        item.menu_category = menu.category;
+        item.table_name = (block.tables[item.table_id] || {}).name;
+        return item;
+    });
+}
+
+async function loadTableOrders(tableId) {
+    try {
+        // Take the feed position first so nothing falls in between
+        const head = await fetch('/api/orders/changes');
+        changesCursor = head.ok ? (await head.json()).cursor : null;
+
+        // Only the open check is loaded, not the table's whole history
+        const response = await fetch(`/api/tables/${tableId}/check?format=compact`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch table orders');
+        }
+
+        const data = await response.json();
+        const check = data.check;
+        const orders = expandCompact(data);
+        currentCheckId = check ? check.id : null;
+        selectedTableOrders = orders;
+
+        // Filter active orders for the order list
+        orderItems = orders
+            .filter(order => !['completed', 'cancelled'].includes(order.status))
+            .map(order => ({
+                menu_id: order.menu_id,
+                name: order.menu_name,
+                category: order.menu_category,
+                quantity: order.quantity,
+                price: order.unit_price,
+                subtotal: order.subtotal,
+                notes: order.notes
+            }));
+
+        renderOrder();
+        renderOrderHistory();
+
+        // Update button states
+        const hasActiveOrders = orderItems.length > 0;
+        document.getElementById('submit-order-btn').disabled = !hasActiveOrders;
+        document.getElementById('cancel-order-btn').disabled = !hasActiveOrders;
+        document.getElementById('checkout-btn').disabled = !hasActiveOrders;
+
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification(error.message, 'error');
+    }
+}
+
+function renderOrderHistory() {
+    const historyContainer = document.createElement('div');
+    historyContainer.className = 'order-history';
+
+    // Group orders by status
+    const ordersByStatus = {
+        pending: [],
+        inprogress: [],
+        completed: [],
+        cancelled: []
+    };
+
+    selectedTableOrders.forEach(order => {
+        ordersByStatus[order.status].push(order);
+    });
+
+    // Create status sections
+    Object.entries(ordersByStatus).forEach(([status, orders]) => {
+        if (orders.length > 0) {
+            const section = document.createElement('div');
+            section.className = `order-section ${status}`;
+            section.innerHTML = `
+                <h3>${status.charAt(0).toUpperCase() + status.slice(1)} Orders</h3>
+                <div class="order-list">
+                    ${orders.map(order => `
+                        <div class="order-item ${status}">
+                            <div class="order-item-header">
+                                <span class="menu-name">${order.menu_name}</span>
+                                <span class="timestamp">${formatTime(order.created_at)}</span>
+                            </div>
+                            <div class="order-item-details">
+                                <span>Quantity: ${order.quantity}</span>
+                                <span>Total: ₩${formatNumber(order.subtotal)}</span>
+                            </div>
+                            ${order.notes ? `<div class="order-notes">${order.notes}</div>` : ''}
+                        </div>
+                    `).join('')}
+                </div>
+            `;
+            historyContainer.appendChild(section);
+        }
+    });
+
+    // Replace existing history
+    const existingHistory = document.querySelector('.order-history');
+    if (existingHistory) {
+        existingHistory.replaceWith(historyContainer);
+    } else {
+        document.querySelector('.order-items-container').appendChild(historyContainer);
+    }
+}
+
+// Menu search
+const menuSearch = document.getElementById('menu-search');
+menuSearch.addEventListener('input', () => {
+    const searchTerm = menuSearch.value.toLowerCase();
+    document.querySelectorAll('.menu-item').forEach(item => {
+        const searchText = item.dataset.search;
+        const category = document.querySelector('.menu-category-btn.active').dataset.category;
+        const categoryMatch = category === 'all' || item.dataset.category === category;
+        item.style.display = searchText.includes(searchTerm) && categoryMatch ? '' : 'none';
+    });
+});
+
+// Menu category filtering
+document.querySelectorAll('.menu-category-btn').forEach(button => {
+    button.addEventListener('click', () => {
+        document.querySelectorAll('.menu-category-btn').forEach(b => b.classList.remove('active'));
+        button.classList.add('active');
+
+        const category = button.dataset.category;
+        const searchTerm = menuSearch.value.toLowerCase();
+
+        document.querySelectorAll('.menu-item').forEach(item => {
+            const searchText = item.dataset.search;
+            const categoryMatch = category === 'all' || item.dataset.category === category;
+            item.style.display = searchText.includes(searchTerm) && categoryMatch ? '' : 'none';
+        });
+    });
+});
+
+// Add item to order
+document.querySelectorAll('.add-to-order-btn').forEach(button => {
+    button.addEventListener('click', () => {
+        if (!selectedTable) {
+            showNotification('테이블을 먼저 선택해주세요', 'error');
+            return;
+        }
+
+        if (button.classList.contains('disabled')) {
+            showNotification('현재 판매할 수 없는 메뉴입니다', 'error');
+            return;
+        }
+
+        const menuId = parseInt(button.dataset.menuId);
+        const menuName = button.dataset.menuName;
+        const menuPrice = parseFloat(button.dataset.menuPrice);
+        const menuCategory = button.dataset.menuCategory;
+
+        const existingItem = orderItems.find(item => item.menu_id === menuId);
+        if (existingItem) {
+            existingItem.quantity++;
+            showNotification(`${menuName} 수량이 증가되었습니다`, 'success');
+        } else {
+            orderItems.push({
+                menu_id: menuId,
+                name: menuName,
+                category: menuCategory,
+                quantity: 1,
+                price: menuPrice
+            });
+            showNotification(`${menuName}이(가) 추가되었습니다`, 'success');
+        }
+
+        renderOrder();
+    });
+});
+
+// Offline order queue: orders that could not reach the server are
+// kept in localStorage and replayed in one request on reconnect
+const OFFLINE_QUEUE_KEY = 'pos.offlineOrders';
+let lastSubmission = null;
+let replaying = false;
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+function loadOfflineQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(OFFLINE_QUEUE_KEY)) || [];
+    } catch (error) {
+        return [];
+    }
+}
+
+function saveOfflineQueue(queue) {
+    localStorage.setItem(OFFLINE_QUEUE_KEY, JSON.stringify(queue));
+}
+
+async function replayOfflineOrders() {
+    if (replaying || loadOfflineQueue().length === 0) return;
+    replaying = true;
+    try {
+        const response = await fetch('/api/orders/replay', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ entries: loadOfflineQueue() })
+        });
+        if (!response.ok) return;
+
+        const { results } = await response.json();
+        const processed = new Set(results.map(result => result.idempotency_key));
+        saveOfflineQueue(loadOfflineQueue().filter(entry => !processed.has(entry.idempotency_key)));
+
+        const created = results.filter(result => result.status === 'created').length;
+        const rejected = results.filter(result => result.status === 'rejected').length;
+        if (created) showNotification(`대기 중이던 주문 ${created}건이 전송되었습니다`, 'success');
+        if (rejected) showNotification(`대기 중이던 주문 ${rejected}건이 거부되었습니다`, 'error');
+        await refreshTables();
+    } catch (error) {
+        console.error('Error replaying offline orders:', error);
+    } finally {
+        replaying = false;
+    }
+}
+
+window.addEventListener('online', replayOfflineOrders);
+
+function clearCurrentOrder() {
+    orderItems.length = 0;
+    document.getElementById('order-notes-input').value = '';
+    renderOrder();
+}
+
+// Submit order
+document.getElementById('submit-order-btn').addEventListener('click', async () => {
+    if (!selectedTable || orderItems.length === 0) return;
+
+    const items = orderItems.map(item => ({
+        table_id: selectedTable.id,
+        menu_id: item.menu_id,
+        quantity: item.quantity,
+        notes: document.getElementById('order-notes-input').value
+    }));
+    const body = JSON.stringify({ items });
+    // Re-tapping after a failure resends the same key, so the server
+    // answers with the original order instead of creating a duplicate
+    if (!lastSubmission || lastSubmission.body !== body) {
+        lastSubmission = { key: newIdempotencyKey(), body };
+    }
+
+    try {
+        let response;
+        try {
+            response = await fetch('/api/orders', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': lastSubmission.key
+                },
+                body
+            });
+        } catch (networkError) {
+            const queue = loadOfflineQueue();
+            queue.push({ idempotency_key: lastSubmission.key, items });
+            saveOfflineQueue(queue);
+            lastSubmission = null;
+            clearCurrentOrder();
+            showNotification('네트워크 연결이 없어 주문을 보관했습니다. 연결되면 자동으로 전송됩니다', 'info');
+            return;
+        }
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.message || '주문 전송에 실패했습니다');
+        }
+
+        lastSubmission = null;
+        showNotification('주문이 성공적으로 전송되었습니다', 'success');
+
+        // Clear the order
+        clearCurrentOrder();
+
+        // Refresh tables
+        await refreshTables();
+
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification(error.message, 'error');
+    }
+});
+
+// Cancel order
+document.getElementById('cancel-order-btn').addEventListener('click', () => {
+    if (orderItems.length === 0) return;
+
+    if (confirm('현재 주문을 취소하시겠습니까? 이 작업은 되돌릴 수 없습니다.')) {
+        orderItems.length = 0;
+        document.getElementById('order-notes-input').value = '';
+        renderOrder();
+        showNotification('주문이 취소되었습니다', 'info');
+    }
+});
+
+// Checkout functionality
+document.getElementById('checkout-btn').addEventListener('click', async () => {
+    if (!selectedTable || orderItems.length === 0) return;
+
+    if (!confirm('결제를 완료하시겠습니까? 이 작업은 되돌릴 수 없습니다.')) return;
+
+    try {
+        const response = await fetch('/api/orders/complete', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                table_id: selectedTable.id
+            })
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.message || '결제 처리 중 오류가 발생했습니다');
+        }
+
+        showNotification('결제가 완료되었습니다', 'success');
+
+        // Clear the order and table selection
+        orderItems = [];
+        selectedTableOrders = [];
+        currentCheckId = null;
+        document.getElementById('order-notes-input').value = '';
+        document.querySelectorAll('.table').forEach(b => b.classList.remove('selected'));
+        socket.emit('unsubscribe', { tables: [selectedTable.id] });
+        selectedTable = null;
+        document.getElementById('selected-table').textContent = '테이블을 선택하세요';
+
+        renderOrder();
+        renderOrderHistory();
+
+        // Refresh tables
+        await refreshTables();
+
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification(error.message, 'error');
+    }
+});
+
+// Quantity controls
+document.querySelector('#order-items').addEventListener('click', (e) => {
+    const button = e.target.closest('button');
+    if (!button) return;
+
+    const index = parseInt(button.dataset.index);
+    if (isNaN(index)) return;
+
+    const item = orderItems[index];
+
+    if (button.classList.contains('minus')) {
+        if (item.quantity > 1) {
+            item.quantity--;
+            showNotification(`${item.name} 수량이 감소되었습니다`, 'info');
+        }
+    } else if (button.classList.contains('plus')) {
+        item.quantity++;
+        showNotification(`${item.name} 수량이 증가되었습니다`, 'info');
+    } else if (button.classList.contains('delete')) {
+        if (confirm(`${item.name}을(를) 주문에서 제거하시겠습니까?`)) {
+            orderItems.splice(index, 1);
+            showNotification(`${item.name}이(가) 제거되었습니다`, 'info');
+        }
+    }
+
+    renderOrder();
+});
+
+// Enhanced renderOrder function
+function renderOrder() {
+    const tbody = document.querySelector('#order-items tbody');
+    tbody.innerHTML = '';
+    let subtotal = 0;
+
+    orderItems.forEach((item, index) => {
+        const itemSubtotal = item.price * item.quantity;
+        subtotal += itemSubtotal;
+
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>
+                <div class="menu-info">
+                    <span class="menu-name">${item.name}</span>
+                    <span class="menu-category">${item.category}</span>
+                </div>
+            </td>
+            <td>
+                <div class="quantity-control">
+                    <button class="btn-icon minus" data-index="${index}">-</button>
+                    <span class="quantity">${item.quantity}</span>
+                    <button class="btn-icon plus" data-index="${index}">+</button>
+                </div>
+            </td>
+            <td class="text-right">₩${formatNumber(item.price)}</td>
+            <td class="text-right">₩${formatNumber(itemSubtotal)}</td>
+            <td>
+                <button class="btn-icon delete" data-index="${index}">×</button>
+            </td>
+        `;
+
+        tbody.appendChild(tr);
+    });
+
+    // 주문 금액 업데이트
+    document.getElementById('order-subtotal').textContent = formatNumber(subtotal);
+    document.getElementById('order-total').textContent = formatNumber(subtotal);
+
+    // 버튼 상태 업데이트
+    const hasItems = orderItems.length > 0;
+    document.getElementById('submit-order-btn').disabled = !hasItems || !selectedTable;
+    document.getElementById('cancel-order-btn').disabled = !hasItems;
+    document.getElementById('checkout-btn').disabled = !hasItems || !selectedTable;
+}
+
+// Refresh tables
+async function refreshTables() {
+    try {
+        const response = await fetch('/api/tables');
+        if (!response.ok) throw new Error('Failed to fetch tables');
+
+        const tables = await response.json();
+        const tablesContainer = document.getElementById('tables');
+
+        tables.forEach(table => {
+            const tableButton = tablesContainer.querySelector(`[data-table-id="${table.id}"]`);
+            if (tableButton) {
+                tableButton.classList.toggle('occupied', table.active_items > 0);
+                const span = tableButton.querySelector('.active-items');
+                if (table.active_items > 0) {
+                    if (span) {
+                        span.textContent = `(${table.active_items})`;
+                    } else {
+                        const newSpan = document.createElement('span');
+                        newSpan.className = 'active-items';
+                        newSpan.textContent = `(${table.active_items})`;
+                        tableButton.appendChild(newSpan);
+                    }
+                } else if (span) {
+                    span.remove();
+                }
+            }
+        });
+    } catch (error) {
+        console.error('Error refreshing tables:', error);
+        showNotification('테이블 정보 새로고침에 실패했습니다', 'error');
+    }
+}
+
+// Enhanced notification system
+function showNotification(message, type = 'info') {
+    const notification = document.getElementById('notification');
+    notification.textContent = message;
+    notification.className = `notification ${type}`;
+    notification.style.display = 'block';
+
+    // Auto-hide after 3 seconds
+    setTimeout(() => {
+        notification.style.display = 'none';
+    }, 3000);
+}
+
+// Cleanup
+window.addEventListener('beforeunload', () => {
+    if (orderItems.length > 0) {
+        return '주문이 완료되지 않았습니다. 정말로 나가시겠습니까?';
+    }
+});
+
+// Initialize
+socket.connect();
+
+// 숫자 포맷 함수
+function formatNumber(num) {
+    return new Intl.NumberFormat('ko-KR').format(num);
+}
+
+// Add these utility functions if not already present
+function formatTime(timestamp) {
+    return new Date(timestamp).toLocaleTimeString('ko-KR', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+}
@@ -0,0 +1,305 @@
+// Socket.io setup
+const socket = io();
+let isConnected = false;
+
+socket.on('connect', () => {
+    console.log('Socket connected');
+    isConnected = true;
+    socket.emit('subscribe', { views: ['setup'] });
+    showNotification('실시간 업데이트가 연결되었습니다', 'success');
+});
+
+socket.on('connect_error', (error) => {
+    console.error('Socket connection error:', error);
+    isConnected = false;
+    showNotification('실시간 업데이트 연결에 실패했습니다', 'error');
+});
+
+// The event carries only the created and changed menus
+socket.on('menu_updated', (data) => {
+    if (!data || !Array.isArray(data.menus)) {
+        fetchMenuItems();
+        return;
+    }
+    data.menus.forEach(menu => {
+        const index = menuItems.findIndex(item => item.id === menu.id);
+        if (index === -1) {
+            menuItems.push(menu);
+        } else {
+            menuItems[index] = menu;
+        }
+        categories.add(menu.category);
+    });
+    updateCategoryFilter();
+    renderMenuItems();
+});
+
+// State management
+let menuItems = [];
+let isLoading = false;
+const categories = new Set();
+
+// Initialize
+async function initialize() {
+    await fetchMenuItems();
+    setupEventListeners();
+}
+
+// Fetch menu items
+async function fetchMenuItems() {
+    try {
+        const response = await fetch('/api/menus');
+        if (!response.ok) throw new Error('Failed to fetch menu items');
+
+        menuItems = await response.json();
+        categories.clear();
+        menuItems.forEach(item => {
+            if (item.category) categories.add(item.category);
+        });
+
+        updateCategoryFilter();
+        renderMenuItems();
+
+    } catch (error) {
+        console.error('Error fetching menu items:', error);
+        showNotification('메뉴 목록을 불러오는데 실패했습니다', 'error');
+    }
+}
+
+// Update category filter
+function updateCategoryFilter() {
+    const select = document.getElementById('category-filter');
+    const currentValue = select.value;
+
+    // Clear existing options except "All"
+    while (select.options.length > 1) {
+        select.remove(1);
+    }
+
+    // Add categories
+    Array.from(categories).sort().forEach(category => {
+        const option = document.createElement('option');
+        option.value = category;
+        option.textContent = category;
+        select.appendChild(option);
+    });
+
+    // Restore previous selection if it still exists
+    if (Array.from(select.options).some(opt => opt.value === currentValue)) {
+        select.value = currentValue;
+    }
+}
+
+// Render menu items
+function renderMenuItems() {
+    const tbody = document.querySelector('#menu-table tbody');
+    tbody.innerHTML = '';
+
+    const searchTerm = document.getElementById('menu-search').value.toLowerCase();
+    const categoryFilter = document.getElementById('category-filter').value;
+
+    const filteredItems = menuItems.filter(item => {
+        const matchesSearch = item.name.toLowerCase().includes(searchTerm) ||
+                           (item.description && item.description.toLowerCase().includes(searchTerm));
+        const matchesCategory = categoryFilter === 'all' || item.category === categoryFilter;
+        return matchesSearch && matchesCategory;
+    });
+
+    filteredItems.forEach((item, index) => {
+        const tr = document.createElement('tr');
+        tr.dataset.index = index;
+
+        tr.innerHTML = `
+            <td>
+                <input type="hidden" name="id" value="${item.id || ''}">
+                <input type="text" name="name" value="${item.name}" 
+                       class="menu-name-input" required
+                       placeholder="메뉴명 입력">
+            </td>
+            <td>
+                <input type="number" name="price" value="${item.price}" 
+                       class="price-input" step="0.01" min="0" required
+                       placeholder="0.00">
+            </td>
+            <td>
+                <input type="text" name="category" value="${item.category}" 
+                       class="category-input" required
+                       placeholder="카테고리 입력"
+                       list="categories">
+            </td>
+            <td>
+                <input type="text" name="description" value="${item.description || ''}" 
+                       class="description-input"
+                       placeholder="설명 입력">
+            </td>
+            <td>
+                <label class="switch">
+                    <input type="checkbox" name="is_available" ${item.is_available ? 'checked' : ''}>
+                    <span class="slider"></span>
+                </label>
+            </td>
+            <td>
+                <button class="delete-btn" onclick="deleteMenuItem(${index})">
+                    <span class="icon">🗑️</span>
+                    삭제
+                </button>
+            </td>
+        `;
+
+        tbody.appendChild(tr);
+    });
+
+    // Update datalist for categories
+    let datalist = document.getElementById('categories');
+    if (!datalist) {
+        datalist = document.createElement('datalist');
+        datalist.id = 'categories';
+        document.body.appendChild(datalist);
+    }
+    datalist.innerHTML = Array.from(categories)
+        .map(cat => `<option value="${cat}">`)
+        .join('');
+}
+
+// Setup event listeners
+function setupEventListeners() {
+    // Search input
+    document.getElementById('menu-search').addEventListener('input', renderMenuItems);
+
+    // Category filter
+    document.getElementById('category-filter').addEventListener('change', renderMenuItems);
+
+    // Add new menu item
+    document.getElementById('add-menu-btn').addEventListener('click', () => {
+        menuItems.unshift({
+            name: '',
+            price: 0,
+            category: '',
+            description: '',
+            is_available: true
+        });
+        renderMenuItems();
+
+        // Focus on the first input of the new row
+        const firstInput = document.querySelector('#menu-table tbody tr:first-child input[name="name"]');
+        if (firstInput) firstInput.focus();
+    });
+
+    // Save all changes
+    document.getElementById('save-all-btn').addEventListener('click', saveAllChanges);
+}
+
+// Delete menu item
+async function deleteMenuItem(index) {
+    const item = menuItems[index];
+    if (!item) return;
+
+    if (!confirm('이 메뉴를 삭제하시겠습니까?')) return;
+
+    try {
+        if (item.id) {
+            const response = await fetch(`/api/menus/${item.id}`, {
+                method: 'DELETE'
+            });
+
+            if (!response.ok) throw new Error('Failed to delete menu item');
+
+            const data = await response.json();
+            if (!data.success) throw new Error(data.message || '메뉴 삭제에 실패했습니다');
+        }
+
+        menuItems.splice(index, 1);
+        renderMenuItems();
+        showNotification('메뉴가 삭제되었습니다', 'success');
+
+    } catch (error) {
+        console.error('Error deleting menu item:', error);
+        showNotification(error.message, 'error');
+    }
+}
+
+// Save all changes
+async function saveAllChanges() {
+    if (isLoading) return;
+    setLoading(true);
+
+    try {
+        const updatedItems = [];
+        const rows = document.querySelectorAll('#menu-table tbody tr');
+
+        // Validate and collect data
+        rows.forEach(row => {
+            const item = {
+                id: row.querySelector('input[name="id"]').value || null,
+                name: row.querySelector('input[name="name"]').value.trim(),
+                price: parseFloat(row.querySelector('input[name="price"]').value),
+                category: row.querySelector('input[name="category"]').value.trim(),
+                description: row.querySelector('input[name="description"]').value.trim() || null,
+                is_available: row.querySelector('input[name="is_available"]').checked
+            };
+
+            // Validation
+            if (!item.name) throw new Error('메뉴 이름은 필수입니다');
+            if (isNaN(item.price) || item.price < 0) throw new Error('올바른 가격을 입력하세요');
+            if (!item.category) throw new Error('카테고리는 필수입니다');
+
+            updatedItems.push(item);
+        });
+
+        // Send update request
+        const response = await fetch('/api/menus', {
+            method: 'PUT',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(updatedItems)
+        });
+
+        if (!response.ok) throw new Error('Failed to update menu items');
+
+        const data = await response.json();
+        if (!data.success) throw new Error(data.message || '메뉴 업데이트에 실패했습니다');
+
+        await fetchMenuItems();
+        const changed = data.created.length + data.updated.length;
+        showNotification(changed ? `${changed}개 메뉴가 저장되었습니다` : '변경된 내용이 없습니다', 'success');
+
+    } catch (error) {
+        console.error('Error saving menu items:', error);
+        showNotification(error.message, 'error');
+    } finally {
+        setLoading(false);
+    }
+}
+
+// Notification system
+function showNotification(message, type = 'info') {
+    const notification = document.getElementById('notification');
+    notification.textContent = message;
+    notification.className = `notification ${type}`;
+    notification.style.display = 'block';
+
+    setTimeout(() => {
+        notification.style.display = 'none';
+    }, 3000);
+}
+
+// Initialize the page
+initialize();
+
+// Cleanup
+window.addEventListener('beforeunload', () => {
+    socket.disconnect();
+});
+
+// Update loading state visuals
+function setLoading(isLoading) {
+    const saveBtn = document.getElementById('save-all-btn');
+    if (isLoading) {
+        saveBtn.classList.add('loading');
+        saveBtn.disabled = true;
+    } else {
+        saveBtn.classList.remove('loading');
+        saveBtn.disabled = false;
+    }
+}
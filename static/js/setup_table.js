@@ -0,0 +1,282 @@
+// Socket.io setup
+const socket = io();
+let isConnected = false;
+
+socket.on('connect', () => {
+    console.log('Socket connected');
+    isConnected = true;
+    socket.emit('subscribe', { views: ['setup'] });
+    showNotification('실시간 업데이트가 연결되었습니다', 'success');
+});
+
+socket.on('connect_error', (error) => {
+    console.error('Socket connection error:', error);
+    isConnected = false;
+    showNotification('실시간 업데이트 연결에 실패했습니다', 'error');
+});
+
+// Saves carry only the created and renamed tables; checkouts just the table id
+socket.on('table_updated', (data) => {
+    if (!data || !Array.isArray(data.tables)) {
+        fetchTables();
+        return;
+    }
+    data.tables.forEach(table => {
+        const index = tables.findIndex(item => item.id === table.id);
+        if (index === -1) {
+            tables.push(table);
+        } else {
+            tables[index] = Object.assign({}, tables[index], table);
+        }
+    });
+    renderTables();
+});
+
+socket.on('order_status_updated', () => {
+    fetchTables();
+});
+
+// State management
+let tables = [];
+let isLoading = false;
+
+// Initialize
+async function initialize() {
+    await fetchTables();
+    setupEventListeners();
+}
+
+// Fetch tables
+async function fetchTables() {
+    try {
+        const response = await fetch('/api/tables');
+        if (!response.ok) throw new Error('Failed to fetch tables');
+
+        tables = await response.json();
+        renderTables();
+
+    } catch (error) {
+        console.error('Error fetching tables:', error);
+        showNotification('테이블 목록을 불러오는데 실패했습니다', 'error');
+    }
+}
+
+// Render tables
+function renderTables() {
+    const grid = document.getElementById('table-grid');
+    grid.innerHTML = '';
+
+    tables.forEach((table, index) => {
+        const tableDiv = document.createElement('div');
+        tableDiv.className = 'table-item';
+        if (table.active_items > 0) {
+            tableDiv.classList.add('occupied');
+        }
+
+        tableDiv.innerHTML = `
+            <input type="hidden" name="id" value="${table.id || ''}">
+            <div class="table-header">
+                <input type="text" name="name" value="${table.name}" 
+                       class="table-name-input"
+                       placeholder="테이블 이름" required
+                       ${table.active_items > 0 ? 'disabled' : ''}>
+                ${table.active_items > 0 ? 
+                    `<span class="active-orders">
+                        <span class="icon">🔥</span>
+                        ${table.active_items}개 주문
+                    </span>` : 
+                    `<button class="delete-btn" onclick="deleteTable(${index})">
+                        <span class="icon">🗑️</span>
+                        삭제
+                    </button>`
+                }
+            </div>
+            <div class="table-status">
+                ${table.active_items > 0 ? 
+                    `<div class="status-badge occupied">
+                        <span class="icon">⏳</span>
+                        사용중
+                    </div>` : 
+                    `<div class="status-badge available">
+                        <span class="icon">✓</span>
+                        사용가능
+                    </div>`
+                }
+            </div>
+        `;
+
+        grid.appendChild(tableDiv);
+    });
+}
+
+// Setup event listeners
+function setupEventListeners() {
+    // Add new table
+    document.getElementById('add-table-btn').addEventListener('click', () => {
+        const newTableNumber = tables.length + 1;
+        let newTableName = `Table ${newTableNumber}`;
+
+        // Find a unique name if Table N already exists
+        while (tables.some(t => t.name === newTableName)) {
+            newTableName = `Table ${++newTableNumber}`;
+        }
+
+        tables.unshift({
+            name: newTableName,
+            active_items: 0
+        });
+
+        renderTables();
+
+        // Focus on the first input of the new table
+        const firstInput = document.querySelector('.table-item:first-child input[name="name"]');
+        if (firstInput) {
+            firstInput.focus();
+            firstInput.select();
+        }
+    });
+
+    // Save all changes
+    document.getElementById('save-all-btn').addEventListener('click', saveAllChanges);
+
+    // Auto-save on input change
+    document.getElementById('table-grid').addEventListener('input', (e) => {
+        if (e.target.matches('input[name="name"]')) {
+            const tableDiv = e.target.closest('.table-item');
+            if (!tableDiv) return;
+
+            clearTimeout(tableDiv.saveTimeout);
+            tableDiv.saveTimeout = setTimeout(() => {
+                if (e.target.value.trim()) {
+                    saveAllChanges();
+                }
+            }, 1000);
+        }
+    });
+}
+
+// Delete table
+async function deleteTable(index) {
+    const table = tables[index];
+    if (!table) return;
+
+    if (table.active_items > 0) {
+        showNotification('진행 중인 주문이 있는 테이블은 삭제할 수 없습니다', 'error');
+        return;
+    }
+
+    if (!confirm('이 테이블을 삭제하시겠습니까?')) return;
+
+    try {
+        if (table.id) {
+            const response = await fetch(`/api/tables/${table.id}`, {
+                method: 'DELETE'
+            });
+
+            if (!response.ok) throw new Error('Failed to delete table');
+
+            const data = await response.json();
+            if (!data.success) throw new Error(data.message || '테이블 삭제에 실패했습니다');
+        }
+
+        tables.splice(index, 1);
+        renderTables();
+        showNotification('테이블이 삭제되었습니다', 'success');
+
+    } catch (error) {
+        console.error('Error deleting table:', error);
+        showNotification(error.message, 'error');
+    }
+}
+
+// Save all changes
+async function saveAllChanges() {
+    if (isLoading) return;
+    setLoading(true);
+
+    try {
+        const updatedTables = [];
+        const tableDivs = document.querySelectorAll('.table-item');
+
+        // Validate and collect data
+        tableDivs.forEach(div => {
+            const table = {
+                id: div.querySelector('input[name="id"]').value || null,
+                name: div.querySelector('input[name="name"]').value.trim()
+            };
+
+            if (!table.name) throw new Error('테이블 이름은 필수입니다');
+
+            const duplicates = Array.from(tableDivs).filter(otherDiv => {
+                if (div === otherDiv) return false;
+                const otherName = otherDiv.querySelector('input[name="name"]').value.trim();
+                return table.name === otherName;
+            });
+
+            if (duplicates.length > 0) {
+                throw new Error(`중복된 테이블 이름이 있습니다: ${table.name}`);
+            }
+
+            updatedTables.push(table);
+        });
+
+        const response = await fetch('/api/tables', {
+            method: 'PUT',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(updatedTables)
+        });
+
+        if (!response.ok) throw new Error('Failed to update tables');
+
+        const data = await response.json();
+        if (!data.success) throw new Error(data.message || '테이블 업데이트에 실패했습니다');
+
+        await fetchTables();
+        const changed = data.created.length + data.updated.length;
+        showNotification(changed ? `${changed}개 테이블이 저장되었습니다` : '변경된 내용이 없습니다', 'success');
+
+    } catch (error) {
+        console.error('Error saving tables:', error);
+        showNotification(error.message, 'error');
+    } finally {
+        setLoading(false);
+    }
+}
+
+// Notification system
+function showNotification(message, type = 'info') {
+    const notification = document.getElementById('notification');
+    notification.textContent = message;
+    notification.className = `notification ${type}`;
+    notification.style.display = 'block';
+
+    setTimeout(() => {
+        notification.style.display = 'none';
+    }, 3000);
+}
+
+// Initialize the page
+initialize();
+
+// Cleanup
+window.addEventListener('beforeunload', () => {
+    socket.disconnect();
+});
+
+// Update loading state visuals
+function setLoading(isLoading) {
+    const saveBtn = document.getElementById('save-all-btn');
+    const addBtn = document.getElementById('add-table-btn');
+
+    [saveBtn, addBtn].forEach(btn => {
+        if (isLoading) {
+            btn.classList.add('loading');
+            btn.disabled = true;
+        } else {
+            btn.classList.remove('loading');
+            btn.disabled = false;
+        }
+    });
+}
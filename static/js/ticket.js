@@ -0,0 +1,517 @@
+// Socket.io setup
+const socket = io();
+let isConnected = false;
+let completedPage = 1;
+let completedCursor = '';
+let completedTotal = null;
+let completedShown = 0;
+const ITEMS_PER_PAGE = 10;
+
+// Optional prep station filter, e.g. /tickets?station=bar
+const station = new URLSearchParams(window.location.search).get('station');
+const feedRoom = station ? `station:${station}` : 'view:kitchen';
+
+// Local copy of the active board, kept current by socket deltas
+const activeItems = new Map();
+// Last applied version per item, kept after an item leaves the board
+// so an older coalesced message cannot bring it back
+const itemVersions = new Map();
+let eventEpoch = null;
+let lastSeq = null;
+let resyncing = false;
+let bufferedEvents = [];
+
+// Initialize Sortable instances
+const containers = document.querySelectorAll('.ticket-container');
+const sortables = [];
+
+containers.forEach(container => {
+    const sortable = new Sortable(container, {
+        group: 'tickets',
+        animation: 150,
+        ghostClass: 'ticket-ghost',
+        chosenClass: 'ticket-chosen',
+        dragClass: 'ticket-drag',
+        onEnd: handleDragEnd,
+        delay: 150,
+        delayOnTouchOnly: true,
+        touchStartThreshold: 5
+    });
+    sortables.push(sortable);
+});
+
+// Socket event handlers
+socket.on('connect', () => {
+    console.log('Socket connected');
+    isConnected = true;
+    showNotification('실시간 업데이트가 연결되었습니다', 'success');
+    const subscription = station ? { stations: [station] } : { views: ['kitchen'] };
+    socket.emit('subscribe', subscription, () => fetchOrders());
+});
+
+socket.on('connect_error', (error) => {
+    console.error('Socket connection error:', error);
+    isConnected = false;
+    showNotification('실시간 업데이트 연결에 실패했습니다', 'error');
+});
+
+// Every message on our feed room carries a sequence number; item
+// events also carry full item payloads that are applied locally. A
+// gap in the sequence (missed events, server restart) triggers a
+// full resync.
+socket.onAny((event, data) => {
+    if (!data || typeof data.seq !== 'number' || data.room !== feedRoom) return;
+    console.log(`Received ${event} event with data:`, data);
+    if (resyncing) {
+        bufferedEvents.push(data);
+        return;
+    }
+    handleSequencedEvent(data);
+});
+
+function handleSequencedEvent(data) {
+    if (data.epoch === eventEpoch && data.seq <= lastSeq) return;
+    if (data.epoch !== eventEpoch || data.seq !== lastSeq + 1) {
+        console.log('Event sequence gap detected, resyncing');
+        fetchOrders();
+        return;
+    }
+    lastSeq = data.seq;
+    if (Array.isArray(data.items) && data.items.length) {
+        applyItems(data.items);
+    }
+}
+
+function applyItems(items) {
+    let activeChanged = false;
+    items.forEach(item => {
+        if (itemVersions.get(item.id) > item.version) return;
+        itemVersions.set(item.id, item.version);
+        if (item.status === 'pending' || item.status === 'inprogress') {
+            activeItems.set(item.id, item);
+            activeChanged = true;
+        } else {
+            if (activeItems.delete(item.id)) activeChanged = true;
+            if (item.status === 'completed') prependCompletedItem(item);
+        }
+    });
+    if (activeChanged) renderBoard();
+}
+
+function prependCompletedItem(item) {
+    const container = document.querySelector('[data-status="completed"]');
+    const existing = container.querySelector(`[data-item-id="${item.id}"]`);
+    if (existing) existing.remove();
+    container.prepend(createTicket(item, item));
+}
+
+function renderBoard() {
+    const pendingContainer = document.querySelector('[data-status="pending"]');
+    const progressContainer = document.querySelector('[data-status="inprogress"]');
+    pendingContainer.innerHTML = '';
+    progressContainer.innerHTML = '';
+
+    const items = Array.from(activeItems.values())
+        .sort((a, b) => b.created_at.localeCompare(a.created_at));
+    items.forEach(item => {
+        const container = item.status === 'pending' ? pendingContainer : progressContainer;
+        container.appendChild(createTicket(item, item));
+    });
+}
+
+// Load more button handler
+document.getElementById('load-more').addEventListener('click', async () => {
+    completedPage++;
+    await fetchCompletedOrders();
+});
+
+// Fetch and render orders (full resync)
+async function fetchOrders() {
+    if (resyncing) return;
+    resyncing = true;
+    bufferedEvents = [];
+    try {
+        console.log('Fetching orders...');
+        const params = new URLSearchParams({ format: 'compact' });
+        if (station) params.set('station', station);
+        const response = await fetch(`/api/orders?${params}`);
+        if (!response.ok) {
+            throw new Error(`Failed to fetch orders: ${response.status}`);
+        }
+
+        const items = expandCompact(await response.json());
+        console.log('Orders received:', items);
+
+        eventEpoch = response.headers.get('X-Event-Epoch');
+        lastSeq = parseInt(response.headers.get('X-Event-Seq'), 10);
+
+        activeItems.clear();
+        itemVersions.clear();
+        items.forEach(item => {
+            activeItems.set(item.id, item);
+            itemVersions.set(item.id, item.version);
+        });
+        renderBoard();
+
+        // Fetch completed orders separately
+        completedPage = 1;
+        await fetchCompletedOrders();
+
+    } catch (error) {
+        console.error('Error fetching orders:', error);
+        showNotification('주문 목록을 불러오는데 실패했습니다: ' + error.message, 'error');
+    } finally {
+        resyncing = false;
+        const pending = bufferedEvents;
+        bufferedEvents = [];
+        pending.forEach(handleSequencedEvent);
+    }
+}
+
+async function fetchCompletedOrders() {
+    try {
+        console.log('Fetching completed orders...');
+        // Keyset pagination: only the first page asks for an (estimated) total
+        const params = new URLSearchParams({
+            cursor: completedPage === 1 ? '' : completedCursor,
+            per_page: ITEMS_PER_PAGE,
+            count: completedPage === 1 ? 'estimate' : 'none',
+            format: 'compact'
+        });
+        if (station) params.set('station', station);
+        const response = await fetch(`/api/orders/completed?${params}`);
+        if (!response.ok) {
+            const errorText = await response.text();
+            throw new Error(`Failed to fetch completed orders: ${response.status} - ${errorText}`);
+        }
+
+        const data = await response.json();
+        data.orders = groupByTable(expandCompact(data.orders));
+        console.log('Completed orders data:', data);
+
+        renderCompletedOrders(data.orders, data.total);
+
+        if (completedPage === 1) {
+            completedShown = 0;
+            completedTotal = typeof data.total === 'number' ? data.total : null;
+        }
+        completedShown += data.orders.reduce((sum, order) => sum + order.items.length, 0);
+        completedCursor = data.next_cursor;
+
+        // Update load more button visibility
+        const loadMoreBtn = document.getElementById('load-more');
+        const completedCount = document.querySelector('.completed-count');
+
+        if (data.next_cursor) {
+            loadMoreBtn.style.display = 'block';
+            completedCount.textContent = completedTotal !== null
+                ? `${completedShown}/약 ${completedTotal}건 표시 중`
+                : `${completedShown}건 표시 중`;
+        } else {
+            loadMoreBtn.style.display = 'none';
+            completedCount.textContent = `전체 ${completedShown}건 표시 중`;
+        }
+
+        return data;
+    } catch (error) {
+        console.error('Error fetching completed orders:', error);
+        showNotification('완료된 주문을 불러오는데 실패했습니다: ' + error.message, 'error');
+        throw error;
+    }
+}
+
+function renderActiveOrders(orders) {
+    console.log('Rendering active orders:', orders);
+    const pendingContainer = document.querySelector('[data-status="pending"]');
+    const progressContainer = document.querySelector('[data-status="inprogress"]');
+
+    if (!pendingContainer || !progressContainer) {
+        console.error('Could not find containers for active orders');
+        return;
+    }
+
+    pendingContainer.innerHTML = '';
+    progressContainer.innerHTML = '';
+
+    if (!Array.isArray(orders)) {
+        console.error('Orders is not an array:', orders);
+        return;
+    }
+
+    orders.forEach(order => {
+        if (!Array.isArray(order.items)) {
+            console.error('Order items is not an array:', order);
+            return;
+        }
+
+        order.items.forEach(item => {
+            let container;
+            if (item.status === 'pending') {
+                container = pendingContainer;
+            } else if (item.status === 'inprogress') {
+                container = progressContainer;
+            }
+            if (container) {
+                try {
+                    const ticket = createTicket(item, order);
+                    container.appendChild(ticket);
+                } catch (error) {
+                    console.error('Error creating ticket:', error, item, order);
+                }
+            }
+        });
+    });
+}
+
+function renderCompletedOrders(orders, total) {
+    console.log('Rendering completed orders:', orders);
+    const container = document.querySelector('[data-status="completed"]');
+
+    if (!container) {
+        console.error('Could not find container for completed orders');
+        return;
+    }
+
+    if (completedPage === 1) {
+        container.innerHTML = '';
+    }
+
+    if (!Array.isArray(orders)) {
+        console.error('Completed orders is not an array:', orders);
+        return;
+    }
+
+    orders.forEach(order => {
+        if (!Array.isArray(order.items)) {
+            console.error('Order items is not an array:', order);
+            return;
+        }
+
+        order.items.forEach(item => {
+            try {
+                const ticket = createTicket(item, order);
+                container.appendChild(ticket);
+            } catch (error) {
+                console.error('Error creating completed ticket:', error, item, order);
+            }
+        });
+    });
+}
+
+function createTicket(item, table) {
+    const ticket = document.createElement('div');
+    ticket.className = 'ticket';
+    ticket.dataset.itemId = item.id;
+    ticket.dataset.status = item.status;
+
+    const timeString = new Date(item.created_at).toLocaleTimeString('ko-KR', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+
+    ticket.innerHTML = `
+        <div class="ticket-header">
+            <h3>${table.table_name}</h3>
+            <span class="timestamp">${timeString}</span>
+        </div>
+        <div class="ticket-content">
+            <div class="menu-info">
+                <span class="menu-name">${item.menu_name}</span>
+                <span class="menu-category">${item.menu_category}</span>
+            </div>
+            <div class="order-details">
+                <span>수량: ${item.quantity}</span>
+                <span>단가: ₩${formatNumber(item.unit_price)}</span>
+            </div>
+            <div class="order-total">
+                합계: ₩${formatNumber(item.subtotal)}
+            </div>
+            ${item.notes ? `<div class="notes">${item.notes}</div>` : ''}
+        </div>
+    `;
+
+    return ticket;
+}
+
+// Drag and drop handling
+async function handleDragEnd(event) {
+    const itemId = event.item.dataset.itemId;
+    const newStatus = event.to.dataset.status;
+    const oldStatus = event.from.dataset.status;
+
+    if (newStatus === oldStatus) return;
+
+    console.log('Drag end:', {
+        itemId,
+        newStatus,
+        oldStatus,
+        fromElement: event.from,
+        toElement: event.to,
+        fromDataset: event.from.dataset,
+        toDataset: event.to.dataset
+    });
+
+    try {
+        const response = await fetch(`/api/orders/${itemId}/status`, {
+            method: 'PUT',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ status: newStatus })
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json();
+            console.error('Server error:', errorData);
+            throw new Error(errorData.message || '상태 변경 실패');
+        }
+
+        event.item.dataset.status = newStatus;
+        showNotification('주문 상태가 변경되었습니다', 'success');
+    } catch (error) {
+        console.error('Error details:', error);
+        event.from.appendChild(event.item);
+        showNotification('주문 상태 변경에 실패했습니다: ' + error.message, 'error');
+    }
+}
+
+// API calls
+async function updateOrderStatus(itemId, status) {
+    try {
+        const response = await fetch(`/api/orders/${itemId}/status`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ status })
+        });
+
+        if (!response.ok) throw new Error('Failed to update status');
+
+        showNotification('주문 상태가 변경되었습니다', 'success');
+    } catch (error) {
+        console.error('Error updating order status:', error);
+        throw error;
+    }
+}
+
+// Utility functions
+// Rebuild item objects from a compact (dictionary-encoded) response
+function expandCompact(block) {
+    return block.rows.map(row => {
+        const item = {};
+        block.columns.forEach((column, i) => { item[column] = row[i]; });
+        const menu = block.menus[item.menu_id] || {};
+        item.menu_name = menu.name;
+        item.menu_category = menu.category;
+        item.table_name = (block.tables[item.table_id] || {}).name;
+        return item;
+    });
+}
+
+function groupByTable(items) {
+    const tables = new Map();
+    items.forEach(item => {
+        if (!tables.has(item.table_id)) {
+            tables.set(item.table_id, { table_id: item.table_id, table_name: item.table_name, items: [] });
+        }
+        tables.get(item.table_id).items.push(item);
+    });
+    return Array.from(tables.values());
+}
+
+function formatTime(timestamp) {
+    return new Date(timestamp).toLocaleTimeString('ko-KR', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+}
+
+function formatPrice(price) {
+    return new Intl.NumberFormat('ko-KR').format(price);
+}
+
+function showNotification(message, type = 'info') {
+    const notification = document.getElementById('notification');
+    notification.textContent = message;
+    notification.className = `notification ${type}`;
+    notification.style.display = 'block';
+
+    setTimeout(() => {
+        notification.style.display = 'none';
+    }, 3000);
+}
+
+// Initial load
+fetchOrders();
+
+document.addEventListener('DOMContentLoaded', () => {
+    // 칸반 보드 높이 설정
+    const header = document.querySelector('header');
+    const main = document.querySelector('main');
+    main.style.height = `calc(100vh - ${header.offsetHeight}px)`;
+
+    // Sortable 초기화 수정
+    const containers = document.querySelectorAll('.ticket-container');
+    containers.forEach(container => {
+        new Sortable(container, {
+            group: {
+                name: 'tickets',
+                pull: function (to, from) {
+                    return from.el.dataset.status !== 'completed';
+                },
+                put: function (to) {
+                    return to.el.dataset.status !== 'completed';
+                }
+            },
+            animation: 150,
+            ghostClass: 'ticket-ghost',
+            chosenClass: 'ticket-chosen',
+            dragClass: 'ticket-drag',
+            onEnd: handleDragEnd,
+            delay: 150,
+            delayOnTouchOnly: true,
+            touchStartThreshold: 5
+        });
+    });
+});
+
+// 숫자 포맷 함수 추가
+function formatNumber(num) {
+    return new Intl.NumberFormat('ko-KR').format(num);
+}
+
+// Initialize
+socket.connect();
+
+// Initial fetch of orders
+document.addEventListener('DOMContentLoaded', () => {
+    fetchOrders();
+
+    // Kanban board height setup
+    const header = document.querySelector('header');
+    const main = document.querySelector('main');
+    main.style.height = `calc(100vh - ${header.offsetHeight}px)`;
+
+    // Initialize Sortable
+    const containers = document.querySelectorAll('.ticket-container');
+    containers.forEach(container => {
+        new Sortable(container, {
+            group: {
+                name: 'tickets',
+                pull: function (to, from) {
+                    return from.el.dataset.status !== 'completed';
+                },
+                put: function (to) {
+                    return to.el.dataset.status !== 'completed';
+                }
+            },
+            animation: 150,
+            ghostClass: 'ticket-ghost',
+            chosenClass: 'ticket-chosen',
+            dragClass: 'ticket-drag',
+            onEnd: handleDragEnd,
+            delay: 150,
+            delayOnTouchOnly: true,
+            touchStartThreshold: 5
+        });
+    });
+});